@@ -0,0 +1,105 @@
+"""User note stats
+
+Revision ID: 3f7b1d9c2e64
+Revises: 8a3c6e2f9b10
+Create Date: 2026-10-18 20:41:52.613084
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7b1d9c2e64'
+down_revision = '8a3c6e2f9b10'
+branch_labels = None
+depends_on = None
+
+# Копия функции на момент ревизии, изменения в note_app.models
+# не должны менять уже примененную миграцию
+NOTE_USER_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION note_user_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes UNION ALL SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, NULL AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, localtimestamp AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = (
+    ('insert', 'INSERT', 'NEW TABLE AS new_notes'),
+    ('update', 'UPDATE', 'NEW TABLE AS new_notes OLD TABLE AS old_notes'),
+    ('delete', 'DELETE', 'OLD TABLE AS old_notes'),
+)
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('user', sa.Column('note_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('total_content_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('last_updated_at', sa.DateTime(), nullable=True))
+    # ### end Alembic commands ###
+    # Изменения заметок между пересчетом и созданием триггеров не учитывались бы
+    op.execute('LOCK TABLE note IN SHARE ROW EXCLUSIVE MODE')
+    op.execute(
+        'UPDATE "user" AS u SET note_count = n.note_count, '
+        'total_content_bytes = n.content_bytes, last_updated_at = n.updated_at '
+        'FROM (SELECT user_id, count(*) AS note_count, '
+        'coalesce(sum(octet_length(content)), 0) AS content_bytes, '
+        'max(updated_at) AS updated_at FROM note GROUP BY user_id) AS n '
+        'WHERE u.id = n.user_id'
+    )
+    op.execute(NOTE_USER_STATS_FUNCTION)
+    for name, operation, transition_tables in TRIGGERS:
+        op.execute(
+            f'CREATE TRIGGER note_user_stats_{name} '
+            f'AFTER {operation} ON note REFERENCING {transition_tables} '
+            'FOR EACH STATEMENT EXECUTE FUNCTION note_user_stats()'
+        )
+
+
+def downgrade() -> None:
+    for name, _, _ in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS note_user_stats_{name} ON note')
+    op.execute('DROP FUNCTION IF EXISTS note_user_stats()')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('user', 'last_updated_at')
+    op.drop_column('user', 'total_content_bytes')
+    op.drop_column('user', 'note_count')
+    # ### end Alembic commands ###
@@ -0,0 +1,125 @@
+"""User notes version
+
+Revision ID: 6b4e0c2d7a91
+Revises: 3f7b1d9c2e64
+Create Date: 2026-10-18 23:12:07.418530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b4e0c2d7a91'
+down_revision = '3f7b1d9c2e64'
+branch_labels = None
+depends_on = None
+
+# Копии функции до и после ревизии, изменения в note_app.models
+# не должны менять уже примененную миграцию
+OLD_NOTE_USER_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION note_user_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes UNION ALL SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, NULL AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE "user" AS u SET
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, localtimestamp AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+NOTE_USER_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION note_user_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE "user" AS u SET
+            notes_version = u.notes_version + 1,
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE "user" AS u SET
+            notes_version = u.notes_version + 1,
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, 1 AS note_count, coalesce(octet_length(content), 0) AS content_bytes, updated_at FROM new_notes UNION ALL SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, NULL AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE "user" AS u SET
+            notes_version = u.notes_version + 1,
+            note_count = u.note_count + d.note_count,
+            total_content_bytes = u.total_content_bytes + d.content_bytes,
+            last_updated_at = greatest(u.last_updated_at, d.updated_at)
+        FROM (
+            SELECT user_id, sum(note_count) AS note_count,
+                sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+            FROM (SELECT user_id, -1 AS note_count, -coalesce(octet_length(content), 0) AS content_bytes, localtimestamp AS updated_at FROM old_notes) AS r
+            GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('user', sa.Column('notes_version', sa.BigInteger(), server_default='0', nullable=False))
+    # ### end Alembic commands ###
+    op.execute(NOTE_USER_STATS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(OLD_NOTE_USER_STATS_FUNCTION)
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('user', 'notes_version')
+    # ### end Alembic commands ###
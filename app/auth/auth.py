@@ -1,26 +1,83 @@
-from fastapi_users import FastAPIUsers
+from typing import Optional
+
+import jwt
+from fastapi import Depends
+from fastapi_users import BaseUserManager, FastAPIUsers
 from fastapi_users.authentication import (
     CookieTransport,
     AuthenticationBackend,
     BearerTransport,
 )
 from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
 
+from auth.cache import UserCache, user_cache
 from auth.manager import get_user_manager
 from auth.models import User
 from setings import settings
+from utils.rate_limit import RateLimit
+
+
+class CachedJWTStrategy(JWTStrategy[User, int]):
+    """
+    JWT стратегия, которая сохраняет пользователя по хэшу токена,
+    чтобы повторные запросы с тем же токеном не обращались к таблице user
+    """
+
+    def __init__(self, cache: UserCache, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    async def read_token(
+        self,
+        token: Optional[str],
+        user_manager: BaseUserManager[User, int],
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        user = await self.cache.get_user(token)
+        if user is not None:
+            return user
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            try:
+                data = decode_jwt(
+                    token,
+                    self.decode_key,
+                    self.token_audience,
+                    algorithms=[self.algorithm],
+                )
+            except jwt.PyJWTError:
+                return user
+            await self.cache.set_user(token, user, data["exp"])
+        return user
 
 
 def get_jwt_strategy() -> JWTStrategy:
     return JWTStrategy(secret=settings.SECRET_KEY, lifetime_seconds=3600)
 
 
+def get_cached_jwt_strategy() -> JWTStrategy:
+    if user_cache is None:
+        return get_jwt_strategy()
+    return CachedJWTStrategy(
+        cache=user_cache,
+        secret=settings.SECRET_KEY,
+        lifetime_seconds=3600,
+    )
+
+
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 jwt_backend = AuthenticationBackend(
     name="jwt",
     transport=bearer_transport,
     get_strategy=get_jwt_strategy,
 )
+cached_jwt_backend = AuthenticationBackend(
+    name="jwt",
+    transport=bearer_transport,
+    get_strategy=get_cached_jwt_strategy,
+)
 
 cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=3600)
 cookie_backend = AuthenticationBackend(
@@ -31,4 +88,18 @@ cookie_backend = AuthenticationBackend(
 
 auth_backend = jwt_backend
 fastapi_users = FastAPIUsers[User, int](get_user_manager, [jwt_backend])
-current_active_user = fastapi_users.current_user(active=True)
+# Маршруты /users/* изменяют пользователя в сессии запроса, поэтому используют
+# пользователя из БД. Остальные маршруты получают пользователя из кэша
+current_active_user = FastAPIUsers[User, int](
+    get_user_manager, [cached_jwt_backend]
+).current_user(active=True)
+
+
+class UserRateLimit(RateLimit):
+    """Ограничение частоты запросов группы маршрутов для пользователя"""
+
+    async def __call__(  # type: ignore[override]
+        self,
+        user: User = Depends(current_active_user),
+    ) -> None:
+        await self.check(f"user:{user.id}")
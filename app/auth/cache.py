@@ -0,0 +1,50 @@
+import hashlib
+import time
+
+from auth.models import User
+from setings import settings
+from utils.cache import MemoryCache, dump_model, load_model
+
+# Поля пользователя, которые не сохраняются в кэше
+EXCLUDED_FIELDS = ("hashed_password",)
+
+
+class UserCache(MemoryCache):
+    """
+    Кэш пользователей, прошедших проверку JWT токена, с ключом по хэшу токена.
+    Запись живет не дольше срока действия самого токена
+    """
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def get_user(self, token: str) -> User | None:
+        data = await self.get(self.token_key(token))
+        if data is None:
+            return None
+        return load_model(User, data)
+
+    async def set_user(self, token: str, user: User, expires_at: float) -> None:
+        data = dump_model(user)
+        for field in EXCLUDED_FIELDS:
+            data.pop(field, None)
+        await self.set(self.token_key(token), data, ttl=expires_at - time.time())
+
+    async def delete_user(self, user_id: int) -> None:
+        """Удаляет все записи пользователя после изменения его данных"""
+        keys = [key for key, (_, data) in self._data.items() if data["id"] == user_id]
+        for key in keys:
+            await self.delete(key)
+
+
+def create_user_cache() -> UserCache | None:
+    if settings.AUTH_CACHE_TTL <= 0:
+        return None
+    return UserCache(
+        max_size=settings.AUTH_CACHE_MAX_SIZE,
+        ttl=settings.AUTH_CACHE_TTL,
+    )
+
+
+user_cache = create_user_cache()
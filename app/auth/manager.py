@@ -1,9 +1,10 @@
-from typing import Optional
+from typing import Any, Optional
 
 from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, IntegerIDMixin
 
 from setings import settings
+from .cache import user_cache
 from .models import User, get_user_db
 
 
@@ -24,6 +25,31 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         print(f"Verification requested for user {user.id}. Verification token: {token}")
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        await self.invalidate_user_cache(user.id)
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        await self.invalidate_user_cache(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        await self.invalidate_user_cache(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await self.invalidate_user_cache(user.id)
+
+    @staticmethod
+    async def invalidate_user_cache(user_id: int) -> None:
+        """Удаляет пользователя из кэша проверенных JWT токенов"""
+        if user_cache is not None:
+            await user_cache.delete_user(user_id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
@@ -1,7 +1,7 @@
 # mypy: ignore-errors
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase, SQLAlchemyBaseUserTable
-from sqlalchemy import Column, String
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship
 
@@ -10,6 +10,16 @@ from db import Base, get_async_session
 
 class User(SQLAlchemyBaseUserTable[int], Base):
     user_name = Column(String(60), nullable=False, unique=True)
+    # Количество заметок, их суммарный размер content в байтах и время
+    # последнего создания, изменения или удаления заметки пользователя.
+    # Поддерживаются триггерами таблицы note (note_app.models)
+    note_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_content_bytes = Column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    last_updated_at = Column(DateTime)
+    # Увеличивается каждым запросом, изменившим заметки пользователя
+    notes_version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     notes = relationship("Note", overlaps="user")
 
@@ -1,9 +1,14 @@
+import datetime
+
 from fastapi_users import schemas
 from pydantic import EmailStr, BaseModel
 
 
 class UserRead(schemas.BaseUser[int]):
     user_name: str
+    note_count: int = 0
+    total_content_bytes: int = 0
+    last_updated_at: datetime.datetime | None = None
 
 
 class UserName(BaseModel):
@@ -1,28 +1,169 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import time
+from functools import lru_cache
 from typing import AsyncGenerator, Generator
 
-from sqlalchemy import create_engine, Integer, Column
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from fastapi import Depends, Request, Response
+from sqlalchemy import Engine, create_engine, Integer, Column
+from sqlalchemy.ext.asyncio import (
+    async_sessionmaker,
+    create_async_engine,
+    AsyncEngine,
+    AsyncSession,
+)
 from sqlalchemy.orm import DeclarativeBase, sessionmaker, Session
 
 from setings import settings
+from utils.metrics import TimedAsyncAdaptedQueuePool
 
 
 class Base(DeclarativeBase):
     id = Column(Integer, primary_key=True)
 
 
-engine = create_engine(settings.SQL_URL, echo=True)
-session_maker = sessionmaker(bind=engine)
+def create_pooled_engine(url: str) -> AsyncEngine:
+    pool_size, max_overflow = settings.DB_POOL_LIMITS
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        query_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        },
+    )
 
-async_engine = create_async_engine(settings.ASYNC_SQL_URL, echo=True)
+
+# Движок создается в каждом процессе воркера при импорте приложения,
+# соединения открываются при запуске воркера и закрываются при остановке
+async_engine = create_pooled_engine(settings.ASYNC_SQL_URL)
 async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False)
 
 
+class ReplicaRouter:
+    """
+    Выбор реплики для чтения: по кругу (round_robin) или с наименьшим числом
+    выданных соединений (least_connections). Клиент, выполнивший запись,
+    в течение pin_seconds читает из основной БД, чтобы увидеть свои изменения.
+    Время окончания привязки передается клиенту в подписанной cookie, поэтому
+    привязка не зависит от того, какой воркер обработает следующий запрос
+    """
+
+    cookie_name = "read_primary_until"
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        strategy: str = "round_robin",
+        pin_seconds: float = 5,
+        secret: str = settings.SECRET_KEY,
+    ) -> None:
+        self.engines = engines
+        self.strategy = strategy
+        self.pin_seconds = pin_seconds
+        self.secret = secret.encode()
+        self._cycle = itertools.cycle(engines)
+
+    def sign(self, value: str) -> str:
+        return hmac.new(self.secret, value.encode(), hashlib.sha256).hexdigest()
+
+    def pin(self, response: Response) -> None:
+        if not self.engines:
+            return
+        expires_at = str(time.time() + self.pin_seconds)
+        response.set_cookie(
+            self.cookie_name,
+            f"{expires_at}:{self.sign(expires_at)}",
+            max_age=int(self.pin_seconds) + 1,
+            httponly=True,
+        )
+
+    def is_pinned(self, request: Request) -> bool:
+        value = request.cookies.get(self.cookie_name)
+        if value is None:
+            return False
+        expires_at, _, signature = value.partition(":")
+        if not hmac.compare_digest(signature, self.sign(expires_at)):
+            return False
+        try:
+            return float(expires_at) > time.time()
+        except ValueError:
+            return False
+
+    def get_engine(self, request: Request) -> AsyncEngine | None:
+        """Возвращает движок реплики или None, если читать нужно из основной БД"""
+        if not self.engines or self.is_pinned(request):
+            return None
+        if self.strategy == "least_connections":
+            return min(self.engines, key=self.checked_out)
+        return next(self._cycle)
+
+    @staticmethod
+    def checked_out(engine: AsyncEngine) -> int:
+        """Количество занятых соединений пула движка"""
+        return engine.pool.checkedout()  # type: ignore[attr-defined]
+
+
+replica_router = ReplicaRouter(
+    engines=[create_pooled_engine(url) for url in settings.DB_REPLICA_URL_LIST],
+    strategy=settings.DB_REPLICA_STRATEGY,
+    pin_seconds=settings.DB_REPLICA_PIN_SECONDS,
+)
+
+
+async def warm_up_engine(engine: AsyncEngine, connections: int) -> None:
+    """Открывает соединения пула заранее, чтобы первые запросы их не ждали"""
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)))
+    for conn in opened:
+        await conn.close()
+
+
+@lru_cache
+def get_sync_engine() -> Engine:
+    """
+    Синхронный движок для служебных скриптов. Приложение работает только
+    с async_engine, поэтому движок и драйвер psycopg2 создаются при первом вызове
+    """
+    return create_engine(settings.SQL_URL, echo=settings.DB_ECHO)
+
+
 def get_session() -> Generator[Session, None, None]:
-    with session_maker() as session:
+    with sessionmaker(bind=get_sync_engine())() as session:
         yield session
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_session(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия только для чтения. При заданных репликах запрос выполняется на одной
+    из них, иначе используется сессия основной БД.
+    Сессия основной БД не открывает соединение, пока не выполнен запрос
+    """
+    engine = replica_router.get_engine(request)
+    if engine is None:
+        yield session
+        return
+    async with AsyncSession(engine, expire_on_commit=False) as replica_session:
+        replica_session.info["replica"] = True
+        yield replica_session
+
+
+def pin_reads_to_primary(request: Request, response: Response) -> None:
+    """После записи следующие чтения клиента выполняются в основной БД"""
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        replica_router.pin(response)
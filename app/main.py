@@ -1,10 +1,47 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
+from auth.cache import user_cache
 from auth.routers import user_router
+from db import async_engine, replica_router, warm_up_engine
 from note_app.routers import note_router
+from note_app.write_behind import note_write_queue
+from setings import settings
+from utils.cache import repository_cache
+from utils.compression import CompressionMiddleware
+from utils.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    render_metrics,
+    statement_cache_metrics,
+)
+from utils.query_metrics import QueryRouteMiddleware, query_metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Прогрев пула соединений при запуске воркера. При остановке записываются
+    отложенные изменения заметок, затем закрываются соединения
+    """
+    engines = [async_engine, *replica_router.engines]
+    if settings.DB_POOL_WARMUP:
+        pool_size, _ = settings.DB_POOL_LIMITS
+        for engine in engines:
+            await warm_up_engine(engine, pool_size)
+    yield
+    if note_write_queue is not None:
+        await note_write_queue.close()
+    for engine in engines:
+        await engine.dispose()
 
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="NotesAPI",
     description="API реализующее CRUD для заметок пользователей.\n"
     "Авторизация пользователей с использованием JWT токенов",
@@ -12,3 +49,34 @@ app = FastAPI(
 
 app.include_router(user_router)
 app.include_router(note_router)
+
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+if settings.DB_QUERY_METRICS:
+    for engine in (async_engine, *replica_router.engines):
+        query_metrics.instrument(engine.sync_engine)
+    app.add_middleware(QueryRouteMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for engine in (async_engine, *replica_router.engines):
+        statement_cache_metrics.instrument(engine.sync_engine)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> PlainTextResponse:
+        """Метрики приложения в текстовом формате Prometheus"""
+        content = render_metrics(
+            pool=async_engine.pool,
+            caches={"notes": repository_cache, "users": user_cache},
+            query_stats=query_metrics.stats() if settings.DB_QUERY_METRICS else None,
+            statement_cache_size=statement_cache_metrics.cache_size(
+                async_engine.sync_engine
+            ),
+        )
+        return PlainTextResponse(content, media_type=PROMETHEUS_CONTENT_TYPE)
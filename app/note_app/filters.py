@@ -1,15 +1,19 @@
-from typing import Optional
+from typing import ClassVar, Optional
 
-from fastapi import Query
+from fastapi import HTTPException, Query, status
 from fastapi_filter import FilterDepends
 from fastapi_filter.contrib.sqlalchemy import Filter
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from auth.models import User
 from note_app.models import Note
+from utils.filters import InvalidSortError, PlannedFilter, parse_filter
 
+NOTE_DEFAULT_ORDER_BY = ["-created_at", "+title"]
+NOTE_SORT_FIELDS = ("id", "title", "content", "created_at", "updated_at", "user_id")
 
-class UserFilter(Filter):
+
+class UserFilter(PlannedFilter):
     user_name__like: Optional[str] = Field(
         Query(
             alias="user",
@@ -22,7 +26,8 @@ class UserFilter(Filter):
         model = User
 
 
-class NoteFilter(Filter):
+class NoteFilter(PlannedFilter):
+    sort_fields: ClassVar[tuple[str, ...]] = NOTE_SORT_FIELDS
     title: Optional[str] = Field(
         Query(
             default=None,
@@ -32,9 +37,10 @@ class NoteFilter(Filter):
     user: Optional[UserFilter] = FilterDepends(UserFilter)
     order_by: Optional[list[str]] = Field(
         Query(
-            default="-created_at,+title",
+            default=None,
             description="Сортировка по дате создания и названию заметки, "
-            "+ в порядке возрастания, - в порядке убывания",
+            "+ в порядке возрастания, - в порядке убывания. "
+            "По умолчанию -created_at,+title, при поиске - по релевантности",
         )
     )
     search: Optional[str] = Field(
@@ -49,8 +55,30 @@ class NoteFilter(Filter):
         search_model_fields = ["title", "content"]
 
 
-class NoteFilterByUserId(Filter):
+class NoteFilterByUserId(PlannedFilter):
+    sort_fields: ClassVar[tuple[str, ...]] = NOTE_SORT_FIELDS
     user_id: Optional[int]
+    order_by: Optional[list[str]] = ["-updated_at"]
 
     class Constants(Filter.Constants):
         model = Note
+
+
+def is_ordered_by_relevance(filter_note: Filter) -> bool:
+    """Результаты поиска без явной сортировки упорядочиваются по релевантности"""
+    return bool(getattr(filter_note, "search", None)) and not getattr(
+        filter_note, "order_by", None
+    )
+
+
+def get_note_filter(
+    filter_values: BaseModel = FilterDepends(NoteFilter),
+) -> NoteFilter:
+    """Фильтр списка заметок, сортировка по неизвестному полю отклоняется сразу"""
+    try:
+        return parse_filter(NoteFilter, filter_values)
+    except InvalidSortError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Переданы не корректные данные для сортировки",
+        )
@@ -1,4 +1,14 @@
-from sqlalchemy import ForeignKey, String, Column, DateTime, func, Integer
+from sqlalchemy import (
+    ForeignKey,
+    String,
+    Column,
+    DateTime,
+    func,
+    Integer,
+    Index,
+    DDL,
+    event,
+)
 from sqlalchemy.orm import relationship
 
 from db import Base
@@ -15,5 +25,101 @@ class Note(Base):
 
     user = relationship("User", overlaps="notes")
 
+    # Индексы повторяют сортировки списков заметок вместе с добавочной
+    # сортировкой по id, чтобы выборка страницы шла по индексу без Sort
+    __table_args__ = (
+        Index("ix_note_user_id_updated_at", user_id, updated_at.desc(), "id"),
+        Index("ix_note_created_at_title", created_at.desc(), title, "id"),
+        # Триграммные индексы для поиска по части title или content (ILIKE)
+        Index(
+            "ix_note_title_trgm",
+            title,
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_note_content_trgm",
+            content,
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+    )
+
     def __repr__(self):
         return f"Заметка - {self.title}"
+
+
+event.listen(
+    Note.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# Изменения счетчиков пользователей по строкам заметок, измененным запросом.
+# Триггеры уровня запроса получают все строки в таблицах переходов
+# new_notes и old_notes, поэтому массовые операции обновляют каждого
+# пользователя одним UPDATE. Версия заметок пользователя увеличивается
+# при каждом изменении, в отличие от счетчиков и времени изменения, которые
+# могут совпасть до и после изменения
+NEW_NOTES = (
+    "SELECT user_id, 1 AS note_count, "
+    "coalesce(octet_length(content), 0) AS content_bytes, updated_at "
+    "FROM new_notes"
+)
+OLD_NOTES = (
+    "SELECT user_id, -1 AS note_count, "
+    "-coalesce(octet_length(content), 0) AS content_bytes, "
+    "{updated_at} AS updated_at FROM old_notes"
+)
+UPDATE_USER_STATS = """
+    UPDATE "user" AS u SET
+        notes_version = u.notes_version + 1,
+        note_count = u.note_count + d.note_count,
+        total_content_bytes = u.total_content_bytes + d.content_bytes,
+        last_updated_at = greatest(u.last_updated_at, d.updated_at)
+    FROM (
+        SELECT user_id, sum(note_count) AS note_count,
+            sum(content_bytes) AS content_bytes, max(updated_at) AS updated_at
+        FROM ({rows}) AS r
+        GROUP BY user_id
+    ) AS d
+    WHERE u.id = d.user_id;
+"""
+
+CHANGED_NOTES = f"{NEW_NOTES} UNION ALL {OLD_NOTES.format(updated_at='NULL')}"
+DELETED_NOTES = OLD_NOTES.format(updated_at="localtimestamp")
+
+NOTE_USER_STATS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION note_user_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {UPDATE_USER_STATS.format(rows=NEW_NOTES)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {UPDATE_USER_STATS.format(rows=CHANGED_NOTES)}
+    ELSE
+        {UPDATE_USER_STATS.format(rows=DELETED_NOTES)}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+event.listen(
+    Note.__table__,
+    "after_create",
+    DDL(NOTE_USER_STATS_FUNCTION).execute_if(dialect="postgresql"),
+)
+for operation, transition_tables in (
+    ("INSERT", "NEW TABLE AS new_notes"),
+    ("UPDATE", "NEW TABLE AS new_notes OLD TABLE AS old_notes"),
+    ("DELETE", "OLD TABLE AS old_notes"),
+):
+    event.listen(
+        Note.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TRIGGER note_user_stats_{operation.lower()} "
+            f"AFTER {operation} ON note REFERENCING {transition_tables} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION note_user_stats()"
+        ).execute_if(dialect="postgresql"),
+    )
@@ -1,26 +1,390 @@
-from typing import Sequence, Any
+import datetime
+from typing import Any, Callable, Hashable, Sequence
 
+from fastapi import Depends
 from fastapi_filter.contrib.sqlalchemy import Filter
-from sqlalchemy.orm import contains_eager
+from sqlalchemy import (
+    func,
+    ColumnElement,
+    update,
+    delete,
+    true,
+    values,
+    column,
+    Integer,
+    String,
+    Row,
+    Select,
+    select,
+    bindparam,
+    BindParameter,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.models import User
+from db import get_async_session, get_read_session
+from note_app.filters import NOTE_DEFAULT_ORDER_BY, NoteFilter
 from note_app.models import Note
+from utils.cache import load_model, repository_cache
+from utils.pagination import InvalidCursorError, Page
 from utils.repository import SQLAlchemyRepository
 
+# Количество символов начала content в кратком представлении заметки
+NOTE_PREVIEW_LENGTH = 200
+
 
 class NotesRepository(SQLAlchemyRepository):
     model = Note
+    cache = repository_cache
+    # Колонки заметки, отдаваемые в списках
+    list_columns = (Note.id, Note.title, Note.content, Note.created_at, Note.updated_at)
+    # Краткое представление: вместо content читается только его начало
+    summary_columns = (
+        Note.id,
+        Note.title,
+        func.left(Note.content, NOTE_PREVIEW_LENGTH).label("preview"),
+        Note.created_at,
+        Note.updated_at,
+    )
+    # Версии строк списка для ETag, без загрузки самих заметок
+    version_columns = (Note.id, Note.updated_at)
 
-    async def find_notes_with_users(
+    def note_columns(self, summary: bool = False, versions: bool = False) -> tuple:
+        if versions:
+            return self.version_columns
+        return self.summary_columns if summary else self.list_columns
+
+    def note_rows_query(self, summary: bool = False) -> Select:
+        """Запрос строк заметок для списка заметок пользователя"""
+        return select(*self.note_columns(summary))
+
+    def notes_with_users_query(
+        self,
+        summary: bool = False,
+        by_relevance: bool = False,
+        versions: bool = False,
+    ) -> Select:
+        """
+        Запрос строк заметок с именами пользователей. При by_relevance строки
+        упорядочиваются по релевантности поиску из параметра search_rank.
+        С versions выбираются только id, время изменения и имя пользователя
+        """
+        columns = self.note_columns(summary, versions)
+        query = select(*columns, User.user_name).join(User)
+        if by_relevance:
+            rank = self.search_rank(bindparam("search_rank", type_=String))
+            query = query.order_by(rank.desc())
+        return query
+
+    def notes_with_users_order(
+        self,
+        filter_elm: NoteFilter | None,
+        cursor: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Задает сортировку по умолчанию, если она не передана. Результаты поиска
+        без сортировки упорядочиваются по релевантности, для них возвращаются
+        параметры запроса notes_with_users_query
+        """
+        if filter_elm is None or filter_elm.order_by:
+            return {}
+        if not filter_elm.search:
+            filter_elm.order_by = list(NOTE_DEFAULT_ORDER_BY)
+            return {}
+        if cursor is not None:
+            raise InvalidCursorError(
+                "Курсор не поддерживается при сортировке по релевантности"
+            )
+        return {"search_rank": filter_elm.search}
+
+    async def find_note_rows(
         self,
         filter_elm: Filter | None = None,
         limit: int = 25,
         page: int = 1,
-    ) -> Sequence[Any]:
-        query = self.get_query().join(User).options(contains_eager(Note.user))
-        return await self._find_elements(
-            query=query,
+        cursor: str | None = None,
+        with_total: bool = False,
+        exact_total: bool = False,
+        summary: bool = False,
+    ) -> Sequence[Row] | Page:
+        return await self._find_list(
+            name=("note_rows", summary),
+            build_query=lambda: self.note_rows_query(summary),
             filter_elm=filter_elm,
             limit=limit,
             page=page,
+            cursor=cursor,
+            with_total=with_total,
+            exact_total=exact_total,
+        )
+
+    async def find_notes_with_users(
+        self,
+        filter_elm: NoteFilter | None = None,
+        limit: int = 25,
+        page: int = 1,
+        cursor: str | None = None,
+        with_total: bool = False,
+        exact_total: bool = False,
+        summary: bool = False,
+        versions: bool = False,
+    ) -> Sequence[Row] | Page:
+        params = self.notes_with_users_order(filter_elm, cursor)
+        by_relevance = bool(params)
+        res = await self._find_list(
+            name=("notes_with_users", summary, by_relevance, versions),
+            build_query=lambda: self.notes_with_users_query(
+                summary, by_relevance, versions
+            ),
+            filter_elm=filter_elm,
+            limit=limit,
+            page=page,
+            cursor=cursor,
+            with_total=with_total,
+            exact_total=exact_total,
+            params=params,
+        )
+        if isinstance(res, Page) and by_relevance:
+            res.next = None
+        return res
+
+    async def _find_list(
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
+        filter_elm: Filter | None,
+        limit: int,
+        page: int,
+        cursor: str | None,
+        with_total: bool,
+        exact_total: bool,
+        params: dict[str, Any] | None = None,
+    ) -> Sequence[Row] | Page:
+        if with_total:
+            return await self._find_page(
+                name=name,
+                build_query=build_query,
+                filter_elm=filter_elm,
+                limit=limit,
+                page=page,
+                cursor=cursor,
+                exact_total=exact_total,
+                params=params,
+            )
+        return await self._find_rows(
+            name=name,
+            build_query=build_query,
+            filter_elm=filter_elm,
+            limit=limit,
+            page=page,
+            cursor=cursor,
+            params=params,
+        )
+
+    async def find_note_version(
+        self,
+        note_id: int,
+    ) -> tuple[int, datetime.datetime | None] | None:
+        """
+        Идентификатор и время изменения заметки для проверки условных
+        запросов без загрузки content. Возвращает None, если заметки нет
+        """
+        if self.cache is not None:
+            data = await self.cache.get(self.cache_key(note_id))
+            if data is not None:
+                note = load_model(Note, data)
+                return note.id, note.updated_at
+        query = self.statement(
+            "find_note_version",
+            lambda: select(Note.id, Note.updated_at).where(
+                Note.id == bindparam("note_id")
+            ),
+        )
+        res = await self.session.execute(query, {"note_id": note_id})
+        row = res.one_or_none()
+        return None if row is None else (row.id, row.updated_at)
+
+    async def find_user_stats(self, user_id: int) -> Row | None:
+        """
+        Счетчики заметок пользователя, которые поддерживаются триггерами
+        таблицы note, без подсчета по самим заметкам
+        """
+        query = self.statement(
+            "find_user_stats",
+            lambda: select(
+                User.note_count,
+                User.total_content_bytes,
+                User.last_updated_at,
+                User.notes_version,
+            ).where(User.__table__.c.id == bindparam("user_id")),
+        )
+        res = await self.session.execute(query, {"user_id": user_id})
+        return res.one_or_none()
+
+    @staticmethod
+    def owner_condition(
+        user_id: int | BindParameter[int],
+        is_superuser: bool = False,
+    ) -> ColumnElement[bool]:
+        """Условие выбора заметок, доступных пользователю для изменения"""
+        if is_superuser:
+            return true()
+        return Note.user_id == user_id
+
+    async def update_note_by_owner(
+        self,
+        note_id: int,
+        user_id: int,
+        is_superuser: bool = False,
+        **kwargs,
+    ) -> bool:
+        """
+        Обновляет заметку одним запросом с проверкой прав пользователя.
+        Возвращает False, если заметка не найдена или у пользователя нет прав
+        """
+        names = sorted(kwargs)
+        stmt = self.statement(
+            f"update_note_by_owner:{is_superuser}:{','.join(names)}",
+            lambda: update(Note)
+            .where(
+                Note.id == bindparam("note_id"),
+                self.owner_condition(bindparam("owner_id"), is_superuser),
+            )
+            .values({name: bindparam(f"value_{name}") for name in names})
+            .returning(Note.id)
+            .execution_options(synchronize_session=False),
         )
+        params = {f"value_{name}": value for name, value in kwargs.items()}
+        res = await self.session.execute(
+            stmt, {"note_id": note_id, "owner_id": user_id, **params}
+        )
+        await self.session.commit()
+        await self.invalidate(note_id)
+        return res.scalar_one_or_none() is not None
+
+    async def delete_note_by_owner(
+        self,
+        note_id: int,
+        user_id: int,
+        is_superuser: bool = False,
+    ) -> bool:
+        """
+        Удаляет заметку одним запросом с проверкой прав пользователя.
+        Возвращает False, если заметка не найдена или у пользователя нет прав
+        """
+        stmt = self.statement(
+            f"delete_note_by_owner:{is_superuser}",
+            lambda: delete(Note)
+            .where(
+                Note.id == bindparam("note_id"),
+                self.owner_condition(bindparam("owner_id"), is_superuser),
+            )
+            .returning(Note.id)
+            .execution_options(synchronize_session=False),
+        )
+        res = await self.session.execute(
+            stmt, {"note_id": note_id, "owner_id": user_id}
+        )
+        await self.session.commit()
+        await self.invalidate(note_id)
+        return res.scalar_one_or_none() is not None
+
+    async def update_notes_by_owner(
+        self,
+        notes: list[dict],
+        user_id: int,
+        is_superuser: bool = False,
+    ) -> set[int]:
+        """
+        Обновляет заметки многострочными UPDATE ... FROM (VALUES ...) с проверкой
+        прав пользователя в одной транзакции. Не переданные поля не изменяются.
+        Возвращает идентификаторы обновленных заметок
+        """
+        return await self.update_notes(
+            notes, self.owner_condition(user_id, is_superuser)
+        )
+
+    async def update_notes(
+        self,
+        notes: list[dict],
+        condition: ColumnElement[bool] = true(),
+    ) -> set[int]:
+        """
+        Обновляет заметки, удовлетворяющие условию condition, многострочными
+        UPDATE ... FROM (VALUES ...) в одной транзакции
+        """
+        updated_ids: set[int] = set()
+        for chunk in self.chunks(notes):
+            note_values = values(
+                column("id", Integer),
+                column("title", String),
+                column("content", String),
+                name="note_values",
+            ).data(
+                [(note["id"], note.get("title"), note.get("content")) for note in chunk]
+            )
+            stmt = (
+                update(Note)
+                .where(Note.id == note_values.c.id, condition)
+                .values(
+                    title=func.coalesce(note_values.c.title, Note.title),
+                    content=func.coalesce(note_values.c.content, Note.content),
+                )
+                .returning(Note.id)
+                .execution_options(synchronize_session=False)
+            )
+            res = await self.session.execute(stmt)
+            updated_ids.update(res.scalars().all())
+        await self.session.commit()
+        for note_id in updated_ids:
+            await self.invalidate(note_id)
+        return updated_ids
+
+    async def delete_notes_by_owner(
+        self,
+        note_ids: list[int],
+        user_id: int,
+        is_superuser: bool = False,
+    ) -> set[int]:
+        """
+        Удаляет заметки многострочными DELETE с проверкой прав пользователя
+        в одной транзакции. Возвращает идентификаторы удаленных заметок
+        """
+        deleted_ids: set[int] = set()
+        for chunk in self.chunks(note_ids):
+            stmt = (
+                delete(Note)
+                .where(Note.id.in_(chunk), self.owner_condition(user_id, is_superuser))
+                .returning(Note.id)
+                .execution_options(synchronize_session=False)
+            )
+            res = await self.session.execute(stmt)
+            deleted_ids.update(res.scalars().all())
+        await self.session.commit()
+        for note_id in deleted_ids:
+            await self.invalidate(note_id)
+        return deleted_ids
+
+    @staticmethod
+    def search_rank(search: str | BindParameter[str]) -> ColumnElement[float]:
+        """
+        Релевантность заметки поисковой строке - наибольшее триграммное
+        сходство строки с частью title или content
+        """
+        return func.greatest(
+            func.word_similarity(search, Note.title),
+            func.word_similarity(search, func.coalesce(Note.content, "")),
+        )
+
+
+async def get_notes_repository(
+    session: AsyncSession = Depends(get_async_session),
+) -> NotesRepository:
+    return NotesRepository(session)
+
+
+async def get_notes_read_repository(
+    session: AsyncSession = Depends(get_read_session),
+) -> NotesRepository:
+    """Репозиторий для чтения, запросы которого могут выполняться на реплике"""
+    return NotesRepository(session)
@@ -1,67 +1,452 @@
-from typing import Annotated, Sequence
+from typing import Annotated, Any, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from fastapi.exceptions import RequestValidationError
-from fastapi_filter import FilterDepends
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    Body,
+    Request,
+    Response,
+    Query,
+)
+from fastapi.responses import StreamingResponse
+from fastapi_filter.contrib.sqlalchemy import Filter
+from sqlalchemy import Row
 
-from auth.auth import current_active_user
+from auth.auth import UserRateLimit, current_active_user
 from auth.models import User
 from note_app import models, schemas, filters
-from note_app.repositorie import NotesRepository
+from db import pin_reads_to_primary
+from note_app.write_behind import get_note_write_queue
+from note_app.repositorie import (
+    NOTE_PREVIEW_LENGTH,
+    NotesRepository,
+    get_notes_repository,
+    get_notes_read_repository,
+)
+from utils.conditional import (
+    is_conditional,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    set_validators,
+)
+from utils.export import csv_chunks, ndjson_chunks
+from utils.pagination import InvalidCursorError, Page, get_next_cursor
+from utils.rate_limit import RateLimit
+from utils.responses import RowsJSONResponse
+from utils.write_behind import WriteBehindQueue
+
+note_router = APIRouter(
+    prefix="/notes",
+    tags=["Note"],
+    dependencies=[Depends(pin_reads_to_primary)],
+    responses={429: {"description": "Превышено количество запросов"}},
+)
+
+NoteViewQuery = Annotated[
+    schemas.NoteView,
+    Query(
+        description="full - заметки целиком, summary - без content, "
+        f"с первыми {NOTE_PREVIEW_LENGTH} символами content в поле preview",
+    ),
+]
+
+
+def set_next_cursor_header(
+    response: Response,
+    res: Sequence[Any] | Page,
+    filter_note: Filter,
+    limit: int | None,
+) -> None:
+    """Передает курсор следующей страницы в заголовке X-Next-Cursor"""
+    if isinstance(res, Page):
+        next_cursor = res.next
+    else:
+        next_cursor = get_next_cursor(res, filter_note, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-note_router = APIRouter(prefix="/notes", tags=["Note"])
+
+def get_list_etag(request: Request, *version: Any) -> str:
+    """
+    ETag списка из параметров запроса и версии выборки. Last-Modified для
+    списков не передается: время последнего изменения не меняется
+    при удалении заметки
+    """
+    return make_etag(
+        request.url.path, sorted(request.query_params.multi_items()), *version
+    )
+
+
+def get_page_etag(request: Request, res: Sequence[Row] | Page) -> str:
+    """
+    ETag страницы списка по id и времени изменения заметок на ней и именам
+    их пользователей, если они есть в строках, без запроса по всей выборке.
+    Курсор следующей страницы определяется последней строкой и не учитывается
+    """
+    rows = res.items if isinstance(res, Page) else res
+    version = [
+        (row.id, row.updated_at, getattr(row, "user_name", None)) for row in rows
+    ]
+    if isinstance(res, Page):
+        return get_list_etag(request, version, res.total)
+    return get_list_etag(request, version)
+
+
+def get_duplicate_result(note_id: int) -> schemas.NoteBulkResult:
+    """Результат для повторного объекта в запросе массовой операции"""
+    return schemas.NoteBulkResult(
+        id=note_id,
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Объект с идентификатором {note_id} повторяется в запросе",
+    )
+
+
+async def get_bulk_results(
+    notes_repository: NotesRepository,
+    note_ids: list[int],
+    results: list[schemas.NoteBulkResult | None],
+    done_ids: set[int],
+    done_detail: str,
+    forbidden_detail: str,
+) -> list[schemas.NoteBulkResult]:
+    """
+    Заполняет результаты массовой операции. Для необработанных объектов
+    одним запросом проверяется их наличие, чтобы отличить 404 от 403
+    """
+    failed_ids = [
+        note_id
+        for note_id, result in zip(note_ids, results)
+        if result is None and note_id not in done_ids
+    ]
+    existing_ids = await notes_repository.find_existing_ids(failed_ids)
+    bulk_results = []
+    for note_id, result in zip(note_ids, results):
+        if result is None:
+            if note_id in done_ids:
+                result = schemas.NoteBulkResult(
+                    id=note_id,
+                    status_code=status.HTTP_200_OK,
+                    detail=f"Объект с идентификатором {note_id} {done_detail}",
+                )
+            elif note_id in existing_ids:
+                result = schemas.NoteBulkResult(
+                    id=note_id,
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=forbidden_detail,
+                )
+            else:
+                result = schemas.NoteBulkResult(
+                    id=note_id,
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Объект с идентификатором {note_id} не найден",
+                )
+        bulk_results.append(result)
+    return bulk_results
 
 
 @note_router.get(
     "/",
-    response_model=list[schemas.NoteListUser],
+    dependencies=[Depends(RateLimit("list"))],
+    response_model=list[schemas.NoteListUser]
+    | schemas.NoteListUserPage
+    | list[schemas.NoteSummaryUser]
+    | schemas.NoteSummaryUserPage,
     responses={
         200: {"description": "Успешный ответ"},
     },
 )
 async def get_list_note(
-    filter_note: filters.NoteFilter = FilterDepends(filters.NoteFilter),
+    request: Request,
+    filter_note: filters.NoteFilter = Depends(filters.get_note_filter),
     pagination: schemas.Paginator = Depends(schemas.Paginator),
-) -> list[schemas.NoteListUser]:
+    view: NoteViewQuery = schemas.NoteView.full,
+    notes_repository: NotesRepository = Depends(get_notes_read_repository),
+) -> Response:
     """
     Возвращает список всех заметок совместно с информацией о создавшем пользователе
     """
     try:
-        res = await NotesRepository().find_notes_with_users(
+        # Для условного запроса версия страницы проверяется запросом id, времени
+        # изменения и имени пользователя, без загрузки и сериализации заметок.
+        # Last-Modified для списков не передается, поэтому проверяется только
+        # If-None-Match
+        if "if-none-match" in request.headers:
+            versions = await notes_repository.find_notes_with_users(
+                filter_elm=filter_note,
+                versions=True,
+                **pagination.dict(),
+            )
+            etag = get_page_etag(request, versions)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+        res = await notes_repository.find_notes_with_users(
             filter_elm=filter_note,
+            summary=view == schemas.NoteView.summary,
             **pagination.dict(),
         )
-    except RequestValidationError:
+    except InvalidCursorError:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Переданы не корректные данные для сортировки",
+            detail="Передан не корректный курсор пагинации",
         )
-    # TODO необходимо избавится от конструкции с генераторм списков
-    return [
-        schemas.NoteListUser(user_name=elm.user.user_name, **elm.__dict__)
-        for elm in res
-    ]
+    etag = get_page_etag(request, res)
+    # response_model используется только для документации,
+    # строки сериализуются напрямую без создания pydantic моделей
+    response = RowsJSONResponse(res)
+    set_validators(response, etag)
+    if not filters.is_ordered_by_relevance(filter_note):
+        set_next_cursor_header(response, res, filter_note, pagination.limit)
+    return response
 
 
 @note_router.get(
     "/user/",
-    response_model=list[schemas.NoteList],
+    dependencies=[Depends(UserRateLimit("list"))],
+    response_model=list[schemas.NoteList]
+    | schemas.NoteListPage
+    | list[schemas.NoteSummary]
+    | schemas.NoteSummaryPage,
     responses={
         200: {"description": "Успешный ответ"},
         401: {"description": "Unauthorized"},
     },
 )
 async def get_list_note_user(
+    request: Request,
     user: User = Depends(current_active_user),
     pagination: schemas.Paginator = Depends(schemas.Paginator),
-) -> Sequence[models.Note]:
+    view: NoteViewQuery = schemas.NoteView.full,
+    notes_repository: NotesRepository = Depends(get_notes_read_repository),
+) -> Response:
     """
     Возвращает список всех заметок конкретного пользователя
     """
     filter_note = filters.NoteFilterByUserId(user_id=user.id)
-    return await NotesRepository().find_elements(
-        filter_elm=filter_note,
-        **pagination.dict(),
+    # Версия заметок пользователя увеличивается триггером при создании,
+    # изменении и удалении любой его заметки
+    stats = await notes_repository.find_user_stats(user_id=user.id)
+    if stats is not None:
+        etag = get_list_etag(request, user.id, stats.notes_version)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+    try:
+        res = await notes_repository.find_note_rows(
+            filter_elm=filter_note,
+            summary=view == schemas.NoteView.summary,
+            **pagination.dict(),
+        )
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Передан не корректный курсор пагинации",
+        )
+    if stats is None:
+        etag = get_page_etag(request, res)
+    response = RowsJSONResponse(res)
+    set_validators(response, etag)
+    set_next_cursor_header(response, res, filter_note, pagination.limit)
+    return response
+
+
+@note_router.get(
+    "/user/export",
+    dependencies=[Depends(UserRateLimit("export"))],
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Успешный ответ",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+        401: {"description": "Unauthorized"},
+    },
+)
+async def export_notes_user(
+    export_format: schemas.ExportFormat = Query(
+        default=schemas.ExportFormat.ndjson,
+        alias="format",
+        description="Формат выгрузки",
+    ),
+    user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+) -> StreamingResponse:
+    """
+    Потоковая выгрузка всех заметок пользователя в формате NDJSON или CSV
+    """
+    filter_note = filters.NoteFilterByUserId(user_id=user.id)
+    # Сессия запроса закрывается после отправки ответа,
+    # поэтому серверный курсор остается открытым на время выгрузки
+    partitions = notes_repository.stream_elements(filter_elm=filter_note)
+    fields = list(schemas.NoteList.__fields__)
+    if export_format == schemas.ExportFormat.csv:
+        content, media_type = csv_chunks(partitions, fields), "text/csv"
+    else:
+        content, media_type = ndjson_chunks(partitions, fields), "application/x-ndjson"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="notes.{export_format.value}"'
+        },
+    )
+
+
+@note_router.get(
+    "/user/stats",
+    dependencies=[Depends(UserRateLimit("list"))],
+    response_model=schemas.NoteUserStats,
+    responses={
+        200: {"description": "Успешный ответ"},
+        401: {"description": "Unauthorized"},
+    },
+)
+async def get_notes_user_stats(
+    user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_read_repository),
+) -> Row:
+    """
+    Количество заметок пользователя, суммарный размер content в байтах
+    и время последнего создания, изменения или удаления заметки
+    """
+    stats = await notes_repository.find_user_stats(user_id=user.id)
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Объект с идентификатором {user.id} не найден",
+        )
+    return stats
+
+
+@note_router.post(
+    "/bulk",
+    dependencies=[Depends(UserRateLimit("bulk"))],
+    response_model=list[schemas.Note],
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Объекты успешно созданы"},
+    },
+)
+async def create_notes_bulk(
+    notes: Annotated[
+        list[schemas.NoteCreate],
+        Body(min_items=1, max_items=schemas.BULK_MAX_SIZE),
+    ],
+    user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+) -> Sequence[models.Note]:
+    """
+    Массовое создание заметок в одной транзакции
+    """
+    return await notes_repository.add_many(
+        [{"user_id": user.id, **note.dict()} for note in notes]
+    )
+
+
+@note_router.patch(
+    "/bulk",
+    dependencies=[Depends(UserRateLimit("bulk"))],
+    response_model=list[schemas.NoteBulkResult],
+    responses={
+        200: {"description": "Результат обновления по каждому объекту"},
+    },
+)
+async def update_notes_bulk(
+    notes: Annotated[
+        list[schemas.NoteBulkUpdate],
+        Body(min_items=1, max_items=schemas.BULK_MAX_SIZE),
+    ],
+    user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+    write_queue: WriteBehindQueue | None = Depends(get_note_write_queue),
+) -> list[schemas.NoteBulkResult]:
+    """
+    Массовое обновление заметок в одной транзакции.
+    Возвращает результат обновления по каждому объекту
+    """
+    results: list[schemas.NoteBulkResult | None] = []
+    notes_param = []
+    note_ids = set()
+    for note in notes:
+        note_param = note.dict(exclude_none=True)
+        if note.id in note_ids:
+            results.append(get_duplicate_result(note.id))
+        elif note_param.keys() == {"id"}:
+            results.append(
+                schemas.NoteBulkResult(
+                    id=note.id,
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Не переданы параметры для обновления объекта",
+                )
+            )
+        else:
+            notes_param.append(note_param)
+            results.append(None)
+        note_ids.add(note.id)
+
+    # Отложенные изменения записываются раньше, чтобы не заменить новые значения
+    if write_queue is not None:
+        await write_queue.flush(*note_ids)
+    updated_ids = await notes_repository.update_notes_by_owner(
+        notes=notes_param,
+        user_id=user.id,
+        is_superuser=user.is_superuser,
+    )
+    return await get_bulk_results(
+        notes_repository=notes_repository,
+        note_ids=[note.id for note in notes],
+        results=results,
+        done_ids=updated_ids,
+        done_detail="успешно обновлен",
+        forbidden_detail="Отсутствуют права на редактирование объекта",
+    )
+
+
+@note_router.delete(
+    "/bulk",
+    dependencies=[Depends(UserRateLimit("bulk"))],
+    response_model=list[schemas.NoteBulkResult],
+    responses={
+        200: {"description": "Результат удаления по каждому объекту"},
+    },
+)
+async def delete_notes_bulk(
+    note_ids: Annotated[
+        list[int],
+        Body(min_items=1, max_items=schemas.BULK_MAX_SIZE),
+    ],
+    user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+    write_queue: WriteBehindQueue | None = Depends(get_note_write_queue),
+) -> list[schemas.NoteBulkResult]:
+    """
+    Массовое удаление заметок в одной транзакции.
+    Возвращает результат удаления по каждому объекту
+    """
+    results: list[schemas.NoteBulkResult | None] = []
+    unique_ids: list[int] = []
+    for note_id in note_ids:
+        if note_id in unique_ids:
+            results.append(get_duplicate_result(note_id))
+        else:
+            unique_ids.append(note_id)
+            results.append(None)
+
+    deleted_ids = await notes_repository.delete_notes_by_owner(
+        note_ids=unique_ids,
+        user_id=user.id,
+        is_superuser=user.is_superuser,
+    )
+    if write_queue is not None:
+        write_queue.discard(*deleted_ids)
+    return await get_bulk_results(
+        notes_repository=notes_repository,
+        note_ids=note_ids,
+        results=results,
+        done_ids=deleted_ids,
+        done_detail="успешно удален",
+        forbidden_detail="Отсутствуют права на удаление объекта",
     )
 
 
@@ -70,26 +455,50 @@ async def get_list_note_user(
     response_model=schemas.Note,
     responses={
         200: {"description": "Успешный ответ"},
+        304: {"description": "Заметка не изменилась"},
         404: {"description": "Объект с идентификатором id не найден"},
     },
 )
 async def get_note_by_id(
     note_id: int,
-) -> models.Note:
+    request: Request,
+    response: Response,
+    notes_repository: NotesRepository = Depends(get_notes_read_repository),
+    write_queue: WriteBehindQueue | None = Depends(get_note_write_queue),
+) -> models.Note | Response:
     """
     Возвращает информацию о заметке по ее идентификатору
     """
-    note = await NotesRepository().find_one(elm_id=note_id)
+    # Отложенные изменения заметки записываются до чтения
+    if write_queue is not None:
+        await write_queue.flush(note_id)
+    not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Объект с идентификатором {note_id} не найден",
+    )
+    # Для условного запроса сначала проверяется только версия заметки,
+    # чтобы не загружать content, если заметка не изменилась
+    if is_conditional(request):
+        version = await notes_repository.find_note_version(note_id)
+        if version is None:
+            raise not_found
+        etag = make_etag(*version)
+        if is_not_modified(request, etag, last_modified=version[1]):
+            return not_modified_response(etag, last_modified=version[1])
+    note = await notes_repository.find_one(elm_id=note_id)
     if note is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Объект с идентификатором {note_id} не найден",
-        )
+        raise not_found
+    set_validators(
+        response,
+        make_etag(note.id, note.updated_at),
+        last_modified=note.updated_at,
+    )
     return note
 
 
 @note_router.post(
     "/",
+    dependencies=[Depends(UserRateLimit("write"))],
     response_model=schemas.Note,
     status_code=status.HTTP_201_CREATED,
     responses={
@@ -99,15 +508,17 @@ async def get_note_by_id(
 async def cerate_note(
     note: Annotated[schemas.NoteCreate, Body()],
     user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
 ) -> models.Note:
     """
     Создание новой заметки
     """
-    return await NotesRepository().add_one(user_id=user.id, **note.dict())
+    return await notes_repository.add_one(user_id=user.id, **note.dict())
 
 
 @note_router.put(
     "/{note_id}/",
+    dependencies=[Depends(UserRateLimit("write"))],
     responses={
         200: {"description": "Объект с идентификатором id успешно обновлен"},
         400: {"description": "Не переданы параметры для обновления объекта"},
@@ -119,25 +530,15 @@ async def update_note(
     note_id: int,
     note: Annotated[schemas.NoteUpdate, Body()],
     user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+    write_queue: WriteBehindQueue | None = Depends(get_note_write_queue),
 ) -> str:
     """
     Обновление заметки.
+    При включенной отложенной записи изменение ставится в очередь
+    после проверки прав и объединяется с другими изменениями заметки,
+    права пользователя проверяются еще раз при записи очереди
     """
-    note_db = await NotesRepository().find_one(elm_id=note_id)
-
-    # Проверка наличия заметки
-    if not note_db:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Объект с идентификатором {note_id} не найден",
-        )
-
-    # Проверка прав доступа
-    if user.id != note_db.user_id and not user.is_superuser:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Отсутствуют права на редактирование объекта",
-        )
     note_param = note.dict(exclude_none=True)
 
     # Проверка что хотябы одно поле передано
@@ -147,12 +548,46 @@ async def update_note(
             detail="Не переданы параметры для обновления объекта",
         )
 
-    await NotesRepository().update_elm(elm_id=note_id, **note_param)
+    if write_queue is not None:
+        db_note = await notes_repository.find_one(elm_id=note_id)
+        if db_note is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект с идентификатором {note_id} не найден",
+            )
+        if db_note.user_id != user.id and not user.is_superuser:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Отсутствуют права на редактирование объекта",
+            )
+        # Права проверяются повторно в запросе записи очереди
+        await write_queue.put(note_id, note_param, scope=(user.id, user.is_superuser))
+        return f"Объект с идентификатором {note_id} успешно обновлен"
+
+    # Обновление с проверкой прав доступа в одном запросе
+    updated = await notes_repository.update_note_by_owner(
+        note_id=note_id,
+        user_id=user.id,
+        is_superuser=user.is_superuser,
+        **note_param,
+    )
+    if not updated:
+        # Проверка наличия заметки
+        if not await notes_repository.exists(elm_id=note_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект с идентификатором {note_id} не найден",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Отсутствуют права на редактирование объекта",
+        )
     return f"Объект с идентификатором {note_id} успешно обновлен"
 
 
 @note_router.delete(
     "/{note_id}/",
+    dependencies=[Depends(UserRateLimit("write"))],
     responses={
         200: {"description": "Объект с идентификатором id успешно удален"},
         403: {"description": "Отсутствуют права на удаление объекта"},
@@ -162,25 +597,29 @@ async def update_note(
 async def delete_note(
     note_id: int,
     user: User = Depends(current_active_user),
+    notes_repository: NotesRepository = Depends(get_notes_repository),
+    write_queue: WriteBehindQueue | None = Depends(get_note_write_queue),
 ) -> str:
     """
     Удаление заметки
     """
-    note_db = await NotesRepository().find_one(elm_id=note_id)
-
-    # Проверка наличия заметки
-    if not note_db:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Объект с идентификатором {note_id} не найден",
-        )
-
-    # Проверка прав доступа
-    if user.id != note_db.user_id and not user.is_superuser:
+    # Удаление с проверкой прав доступа в одном запросе
+    deleted = await notes_repository.delete_note_by_owner(
+        note_id=note_id,
+        user_id=user.id,
+        is_superuser=user.is_superuser,
+    )
+    if not deleted:
+        # Проверка наличия заметки
+        if not await notes_repository.exists(elm_id=note_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект с идентификатором {note_id} не найден",
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Отсутствуют права на удаление объекта",
         )
-
-    await NotesRepository().delete_elm(elm_id=note_id)
+    if write_queue is not None:
+        write_queue.discard(note_id)
     return f"Объект с идентификатором {note_id} успешно удален"
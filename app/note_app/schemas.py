@@ -1,8 +1,14 @@
 import datetime
+from enum import Enum
 
 from fastapi import Query
 from pydantic import BaseModel, Field
 
+# Максимальное количество элементов в запросе массовой операции
+BULK_MAX_SIZE = 5000
+# Длина колонки note.title
+TITLE_MAX_LENGTH = 60
+
 
 class Paginator(BaseModel):
     limit: int | None = Field(
@@ -20,18 +26,59 @@ class Paginator(BaseModel):
             description="Номер страницы",
         )
     )
+    cursor: str | None = Field(
+        Query(
+            default=None,
+            description="Курсор следующей страницы из заголовка X-Next-Cursor, "
+            "при передаче параметр page не учитывается",
+        )
+    )
+    with_total: bool = Field(
+        Query(
+            default=False,
+            description="Вернуть объект {items, total, next} "
+            "с общим количеством элементов и курсором следующей страницы",
+        )
+    )
+    exact_total: bool = Field(
+        Query(
+            default=False,
+            description="Точный подсчет количества для списка без фильтров, "
+            "по умолчанию используется оценка по статистике таблицы",
+        )
+    )
+
+
+class NoteView(str, Enum):
+    full = "full"
+    summary = "summary"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
 
 
 class NoteCreate(BaseModel):
-    title: str
+    title: str = Field(max_length=TITLE_MAX_LENGTH)
     content: str
 
 
 class NoteUpdate(BaseModel):
-    title: str | None = None
+    title: str | None = Field(default=None, max_length=TITLE_MAX_LENGTH)
     content: str | None = None
 
 
+class NoteBulkUpdate(NoteUpdate):
+    id: int
+
+
+class NoteBulkResult(BaseModel):
+    id: int
+    status_code: int
+    detail: str
+
+
 class Note(BaseModel):
     id: int
     title: str
@@ -49,3 +96,48 @@ class NoteList(Note):
 
 class NoteListUser(Note):
     user_name: str
+
+
+class NoteListPage(BaseModel):
+    items: list[NoteList]
+    total: int | None
+    next: str | None
+
+
+class NoteListUserPage(BaseModel):
+    items: list[NoteListUser]
+    total: int | None
+    next: str | None
+
+
+class NoteSummary(BaseModel):
+    id: int
+    title: str
+    preview: str | None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class NoteSummaryUser(NoteSummary):
+    user_name: str
+
+
+class NoteSummaryPage(BaseModel):
+    items: list[NoteSummary]
+    total: int | None
+    next: str | None
+
+
+class NoteSummaryUserPage(BaseModel):
+    items: list[NoteSummaryUser]
+    total: int | None
+    next: str | None
+
+
+class NoteUserStats(BaseModel):
+    note_count: int
+    total_content_bytes: int
+    last_updated_at: datetime.datetime | None
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,46 @@
+from typing import Any
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from db import async_session_maker
+from note_app.repositorie import NotesRepository
+from setings import settings
+from utils.write_behind import WriteBehindQueue
+
+
+async def write_note_updates(
+    owner: tuple[int, bool],
+    updates: dict[int, dict[str, Any]],
+) -> None:
+    """
+    Записывает накопленные изменения заметок одного пользователя одним
+    многострочным UPDATE. Права пользователя owner - (id, is_superuser)
+    проверяются в том же запросе
+    """
+    user_id, is_superuser = owner
+    async with async_session_maker() as session:
+        await NotesRepository(session).update_notes_by_owner(
+            notes=[{"id": note_id, **values} for note_id, values in updates.items()],
+            user_id=user_id,
+            is_superuser=is_superuser,
+        )
+
+
+def create_note_write_queue() -> WriteBehindQueue | None:
+    """Очередь отложенной записи изменений заметок, если она включена"""
+    if not settings.NOTE_WRITE_BEHIND_MS:
+        return None
+    return WriteBehindQueue(
+        write_note_updates,
+        delay=settings.NOTE_WRITE_BEHIND_MS / 1000,
+        max_pending=settings.NOTE_WRITE_BEHIND_MAX_PENDING,
+        # Изменения с такими ошибками не запишутся и при повторе
+        permanent_errors=(DataError, IntegrityError),
+    )
+
+
+note_write_queue = create_note_write_queue()
+
+
+def get_note_write_queue() -> WriteBehindQueue | None:
+    return note_write_queue
@@ -0,0 +1,70 @@
+import logging
+import os
+
+import uvicorn
+
+from setings import settings
+
+logger = logging.getLogger("notes_api.server")
+
+
+def check_worker_settings() -> dict[str, str]:
+    """
+    Проверяет настройки для запуска нескольких воркеров. Возвращает значения
+    переменных окружения, отключающие состояние в памяти процесса. Ограничение
+    частоты запросов в памяти и отложенная запись заметок не отключаются
+    молча, а запрещаются: предел частоты вырос бы в число воркеров раз,
+    а чтение заметки не видело бы изменений в очереди другого воркера
+    """
+    if settings.WORKERS <= 1:
+        return {}
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        raise SystemExit(
+            "RATE_LIMIT_BACKEND=memory не поддерживается при нескольких "
+            "воркерах, используйте redis или none"
+        )
+    # Чтение заметки записывает отложенные изменения только своего воркера
+    if settings.NOTE_WRITE_BEHIND_MS > 0:
+        raise SystemExit(
+            "NOTE_WRITE_BEHIND_MS не поддерживается при нескольких воркерах"
+        )
+    # Кэши очищаются при изменении только в воркере, который его выполнил,
+    # а метрики с одного адреса отдает случайный воркер
+    overrides = {}
+    if settings.CACHE_BACKEND == "memory":
+        overrides["CACHE_BACKEND"] = "none"
+    if settings.AUTH_CACHE_TTL > 0:
+        overrides["AUTH_CACHE_TTL"] = "0"
+    if settings.METRICS_ENABLED:
+        overrides["METRICS_ENABLED"] = "false"
+    if settings.DB_QUERY_METRICS:
+        overrides["DB_QUERY_METRICS"] = "false"
+    for name in overrides:
+        logger.warning(
+            "%s=%s не поддерживается при %s воркерах и отключен",
+            name,
+            getattr(settings, name),
+            settings.WORKERS,
+        )
+    return overrides
+
+
+def main() -> None:
+    """
+    Запуск сервера в WEB_CONCURRENCY процессах воркеров. Каждый воркер создает
+    свой пул соединений, размер которого рассчитывается из DB_MAX_CONNECTIONS
+    """
+    # Воркеры получают настройки из переменных окружения процесса
+    os.environ.update(check_worker_settings())
+    uvicorn.run(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.WORKERS,
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
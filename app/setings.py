@@ -1,4 +1,5 @@
 # mypy: ignore-errors
+import os
 from pathlib import Path, PurePath
 
 from pydantic import BaseSettings
@@ -20,6 +21,101 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Предел соединений с БД на все процессы воркеров, 0 - без ограничения
+    DB_MAX_CONNECTIONS: int = 0
+    # Открытие DB_POOL_SIZE соединений при запуске воркера
+    DB_POOL_WARMUP: bool = True
+
+    # Размер кэша скомпилированных запросов SQLAlchemy и кэша подготовленных
+    # выражений asyncpg в каждом соединении, 0 - кэш отключен (для pgbouncer
+    # в режиме транзакций подготовленные выражения нужно отключить)
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
+    # Адреса реплик для чтения через запятую, в формате ASYNC_SQL_URL
+    DB_REPLICA_URLS: str = ""
+    # round_robin или least_connections
+    DB_REPLICA_STRATEGY: str = "round_robin"
+    # Время после записи, в течение которого клиент читает из основной БД, с
+    DB_REPLICA_PIN_SECONDS: int = 5
+
+    # Параметры запуска сервера, WEB_CONCURRENCY 0 - по числу ядер процессора.
+    # Несколько воркеров запускаются только явно: состояние в памяти процесса
+    # (кэши, ограничение частоты запросов, метрики) у каждого воркера свое
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    WEB_CONCURRENCY: int = 1
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+
+    # Сжатие ответов brotli или gzip, размер в байтах, начиная с которого
+    # ответ сжимается, и уровни сжатия
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1000
+    COMPRESSION_GZIP_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Метрики HTTP запросов, пула соединений и кэшей на /metrics
+    METRICS_ENABLED: bool = True
+    # Сбор статистики запросов к БД и порог журнала медленных запросов, мс
+    DB_QUERY_METRICS: bool = False
+    DB_SLOW_QUERY_MS: int = 200
+
+    # Отложенная запись изменений заметок: изменения одной заметки за окно
+    # в мс объединяются и записываются одним запросом, 0 - запись сразу
+    NOTE_WRITE_BEHIND_MS: int = 0
+    NOTE_WRITE_BEHIND_MAX_PENDING: int = 1000
+
+    # Ограничение частоты запросов: memory - корзины токенов в памяти
+    # процесса, redis - общие для всех воркеров, none - без ограничения
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Ограничения групп маршрутов в формате "количество/период",
+    # период - second, minute или hour
+    RATE_LIMIT_LIST: str = "300/minute"
+    RATE_LIMIT_WRITE: str = "120/minute"
+    RATE_LIMIT_BULK: str = "20/minute"
+    RATE_LIMIT_EXPORT: str = "10/minute"
+
+    # memory, redis или none
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: int = 60
+    CACHE_MAX_SIZE: int = 10000
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Кэш пользователей по JWT токену, 0 - кэш отключен
+    AUTH_CACHE_TTL: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10000
+
+    @property
+    def DB_REPLICA_URL_LIST(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
+    @property
+    def WORKERS(self) -> int:
+        return self.WEB_CONCURRENCY or os.cpu_count() or 1
+
+    @property
+    def DB_POOL_LIMITS(self) -> tuple[int, int]:
+        """
+        Размер пула и переполнение для одного воркера. При заданном
+        DB_MAX_CONNECTIONS соединения делятся между воркерами поровну
+        """
+        if not self.DB_MAX_CONNECTIONS:
+            return self.DB_POOL_SIZE, self.DB_MAX_OVERFLOW
+        per_worker = max(self.DB_MAX_CONNECTIONS // self.WORKERS, 1)
+        pool_size = min(self.DB_POOL_SIZE, per_worker)
+        return pool_size, min(self.DB_MAX_OVERFLOW, per_worker - pool_size)
+
+    @property
+    def DB_ECHO(self) -> bool:
+        """Вывод SQL запросов в журнал только в режиме разработки"""
+        return self.MODE == "DEV"
+
     @property
     def SQL_URL(self) -> str:
         return (
@@ -0,0 +1,227 @@
+import datetime
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import DateTime
+
+from db import Base
+from setings import settings
+
+
+class AbstractCache(ABC):
+    """
+    Абстрактный кэш с подсчетом попаданий и промахов.
+    Удаление записи увеличивает ее поколение. Запись, прочитанная из БД до
+    удаления, сохраняется с поколением, полученным до чтения, и отбрасывается,
+    если поколение уже изменилось
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> dict | None:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    @abstractmethod
+    async def _get(self, key: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: dict,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generation(self, key: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Удаляет все записи, например после пересоздания схемы БД"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class MemoryCache(AbstractCache):
+    """Кэш в памяти процесса с вытеснением по LRU и временем жизни записей"""
+
+    def __init__(self, max_size: int = 10000, ttl: int = 60) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # Поколения удаленных записей, вытесненные поколения не меньше
+        # _min_generation, поэтому их записи до вытеснения отбрасываются
+        self._generations: OrderedDict[str, int] = OrderedDict()
+        self._last_generation = 0
+        self._min_generation = 0
+
+    async def _get(self, key: str) -> dict | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(
+        self,
+        key: str,
+        value: dict,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> None:
+        if generation is not None and generation != await self.generation(key):
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def generation(self, key: str) -> int:
+        return self._generations.get(key, self._min_generation)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self._last_generation += 1
+        self._generations[key] = self._last_generation
+        self._generations.move_to_end(key)
+        while len(self._generations) > self.max_size:
+            _, generation = self._generations.popitem(last=False)
+            self._min_generation = max(self._min_generation, generation)
+
+    async def clear(self) -> None:
+        # Поколения сохраняются, чтобы прочитанные до очистки записи
+        # не попали в кэш
+        self._data.clear()
+
+
+# Сохраняет запись, только если поколение ключа не изменилось
+SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[3] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return 0
+"""
+
+
+class RedisCache(AbstractCache):
+    """
+    Кэш в Redis. Принимает клиент, совместимый с redis.asyncio.Redis
+    (методы get, set с параметром ex, delete, incr, expire, eval и scan_iter).
+    Поколение записи хранится в отдельном ключе и живет не меньше самой записи
+    """
+
+    def __init__(self, client: Any, ttl: int = 60, prefix: str = "notes-api:") -> None:
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def _get(self, key: str) -> dict | None:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def generation_key(self, key: str) -> str:
+        return f"{self.prefix}generation:{key}"
+
+    async def set(
+        self,
+        key: str,
+        value: dict,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> None:
+        ex = self.ttl if ttl is None else max(1, min(int(ttl), self.ttl))
+        if generation is None:
+            await self.client.set(self.prefix + key, json.dumps(value), ex=ex)
+            return
+        await self.client.eval(
+            SET_IF_GENERATION,
+            2,
+            self.prefix + key,
+            self.generation_key(key),
+            json.dumps(value),
+            ex,
+            generation,
+        )
+
+    async def generation(self, key: str) -> int:
+        raw = await self.client.get(self.generation_key(key))
+        return int(raw) if raw is not None else 0
+
+    async def delete(self, key: str) -> None:
+        await self.client.incr(self.generation_key(key))
+        await self.client.expire(self.generation_key(key), self.ttl)
+        await self.client.delete(self.prefix + key)
+
+    async def clear(self) -> None:
+        generation_prefix = self.generation_key("")
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            name = key.decode() if isinstance(key, bytes) else key
+            if not name.startswith(generation_prefix):
+                await self.client.delete(key)
+
+
+def dump_model(elm: Base) -> dict:
+    """Преобразует объект модели в словарь, пригодный для сериализации в JSON"""
+    data = {}
+    for column in elm.__table__.columns:
+        value = getattr(elm, column.key)
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        data[column.key] = value
+    return data
+
+
+def load_model(model: type[Base], data: dict) -> Any:
+    """Восстанавливает объект модели из словаря, полученного из кэша"""
+    values = {}
+    for column in model.__table__.columns:
+        value = data.get(column.key)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.datetime.fromisoformat(value)
+        values[column.key] = value
+    return model(**values)
+
+
+def create_cache() -> AbstractCache | None:
+    """Создает кэш в соответствии с настройкой CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(max_size=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL)
+    if settings.CACHE_BACKEND == "redis":
+        # Необязательная зависимость, не входит в pyproject.toml и
+        # устанавливается отдельно: pip install redis
+        from redis.asyncio import Redis  # type: ignore[import]
+
+        return RedisCache(Redis.from_url(settings.REDIS_URL), ttl=settings.CACHE_TTL)
+    return None
+
+
+repository_cache = create_cache()
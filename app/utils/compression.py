@@ -0,0 +1,201 @@
+import zlib
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    # Необязательная зависимость, не входит в pyproject.toml и устанавливается
+    # отдельно: pip install brotli. Без нее ответы сжимаются только gzip
+    import brotli  # type: ignore[import]
+except ImportError:
+    brotli = None
+
+# Ответы без тела, которые не сжимаются
+NO_BODY_STATUSES = (204, 304)
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def finish(self) -> bytes:
+        ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        # wbits 31 - поток deflate с заголовком и контрольной суммой gzip
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Поддерживаемые кодировки в порядке предпочтения сервера"""
+    if brotli is None:
+        return ("gzip",)
+    return ("br", "gzip")
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Кодировки из заголовка Accept-Encoding с их весами q"""
+    weights = {}
+    for item in header.split(","):
+        name, *params = item.strip().split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights
+
+
+def choose_encoding(header: str, encodings: tuple[str, ...]) -> str | None:
+    """
+    Выбирает кодировку с наибольшим весом q, при равных весах -
+    в порядке encodings. Возвращает None, если сжатие не принимается
+    """
+    weights = parse_accept_encoding(header)
+    default = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, default)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware, сжимающее ответы brotli или gzip в зависимости от
+    заголовка Accept-Encoding. Ответы меньше minimum_size байт и ответы,
+    уже имеющие Content-Encoding, передаются без изменений
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self.app, encoding, self)
+        await responder(scope, receive, send)
+
+    def create_encoder(self, encoding: str) -> Encoder:
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+
+class CompressionResponder:
+    """Сжатие одного ответа, в том числе потокового"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        encoding: str,
+        middleware: CompressionMiddleware,
+    ) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.middleware = middleware
+        self.send: Send
+        self.start_message: Message | None = None
+        self.encoder: Encoder | None = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Заголовки отправляются вместе с первой частью тела,
+            # когда известно, нужно ли сжимать ответ
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers or message["status"] in NO_BODY_STATUSES
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.start_message is not None:
+            await self.send_first_body(self.start_message, message)
+            self.start_message = None
+            return
+        if self.encoder is None:
+            await self.send(message)
+            return
+        body = self.encoder.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if not more_body:
+            body += self.encoder.finish()
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    async def send_first_body(self, start_message: Message, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.passthrough or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            await self.send(start_message)
+            await self.send(message)
+            return
+
+        self.encoder = self.middleware.create_encoder(self.encoding)
+        headers = MutableHeaders(raw=start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        body = self.encoder.compress(body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            body += self.encoder.finish()
+            headers["Content-Length"] = str(len(body))
+        await self.send(start_message)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -0,0 +1,83 @@
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Слабый ETag из значений, определяющих версию ответа. Слабый, так как
+    тело ответа может отличаться побайтово, например при сжатии
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    """Время в БД хранится без часового пояса и считается временем UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def http_date(value: datetime.datetime) -> str:
+    return format_datetime(as_utc(value), usegmt=True)
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение ETag со списком из заголовка If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: datetime.datetime | None = None,
+) -> bool:
+    """
+    Проверяет условия If-None-Match и If-Modified-Since.
+    Если передан If-None-Match, If-Modified-Since не учитывается
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = as_utc(parsedate_to_datetime(if_modified_since))
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified передается с точностью до секунды
+    return as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: datetime.datetime | None = None,
+) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified_response(
+    etag: str,
+    last_modified: datetime.datetime | None = None,
+) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
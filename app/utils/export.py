@@ -0,0 +1,53 @@
+import csv
+import datetime
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row
+
+
+def _default(value: object) -> str:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def _csv_value(value: object) -> object:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+async def ndjson_chunks(
+    partitions: AsyncIterator[Sequence[Row]],
+    fields: list[str],
+) -> AsyncIterator[bytes]:
+    """Кодирует пачки строк в NDJSON, по одному объекту на строку"""
+    async for rows in partitions:
+        lines = [
+            json.dumps(
+                {field: getattr(row, field) for field in fields},
+                default=_default,
+                ensure_ascii=False,
+            )
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def csv_chunks(
+    partitions: AsyncIterator[Sequence[Row]],
+    fields: list[str],
+) -> AsyncIterator[bytes]:
+    """Кодирует пачки строк в CSV, заголовок отправляется до выполнения запроса"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([_csv_value(getattr(row, field)) for field in fields])
+        yield buffer.getvalue().encode()
@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from typing import Any, ClassVar, Hashable, Iterator
+
+from fastapi.exceptions import RequestValidationError
+from fastapi_filter.contrib.sqlalchemy import Filter
+from fastapi_filter.contrib.sqlalchemy.filter import _orm_operator_transformer
+from pydantic import BaseModel, ValidationError, validator
+from sqlalchemy import BindParameter, ColumnElement, Select, bindparam, or_
+
+# Префикс имен параметров запроса со значениями фильтра
+PARAM_PREFIX = "filter_"
+
+
+class InvalidSortError(ValueError):
+    """Сортировка по полю, которого нет среди полей сортировки фильтра"""
+
+
+@dataclass(frozen=True)
+class FilterPlan:
+    """Условия отбора и сортировка для одной формы фильтра"""
+
+    criteria: tuple[ColumnElement[bool], ...]
+    ordering: tuple[ColumnElement[Any], ...]
+
+
+class PlannedFilter(Filter):
+    """
+    Фильтр, условия и сортировка которого строятся один раз для каждой формы:
+    набора заданных полей с операторами и списка полей сортировки. Значения
+    полей в условия не подставляются, а передаются параметрами запроса
+    из filter_params(), поэтому запросы с одной формой фильтра имеют одну
+    структуру и берутся из кэша выражений репозитория
+    """
+
+    # Количество запоминаемых форм фильтров
+    max_plans: ClassVar[int] = 1000
+    _plans: ClassVar[dict[Hashable, FilterPlan]] = {}
+    # Колонки модели, по которым разрешена сортировка
+    sort_fields: ClassVar[tuple[str, ...]] = ()
+
+    @validator("*", allow_reuse=True, check_fields=False)
+    def validate_sort_fields(cls, value, field):
+        """Сортировка разрешена только по полям sort_fields"""
+        if field.name != cls.Constants.ordering_field_name or not value:
+            return value
+        for field_name in value:
+            if field_name.lstrip("+-") not in cls.sort_fields:
+                raise ValueError(f"{field_name} is not a valid ordering field.")
+        return value
+
+    def filter_items(self, prefix: str = "") -> Iterator[tuple[str, Filter, str, Any]]:
+        """
+        Заданные условия фильтра и вложенных фильтров в виде
+        (имя параметра, фильтр поля, имя поля с оператором, значение)
+        """
+        for field_name, _ in self.filtering_fields:
+            value = getattr(self, field_name)
+            if isinstance(value, PlannedFilter):
+                yield from value.filter_items(f"{prefix}{field_name}__")
+            else:
+                yield f"{PARAM_PREFIX}{prefix}{field_name}", self, field_name, value
+
+    @property
+    def shape(self) -> Hashable:
+        """Форма фильтра: заданные поля с операторами и сортировка"""
+        fields = []
+        for param, _, field_name, value in self.filter_items():
+            # Для isnull значение определяет условие, а не параметр запроса
+            fields.append((param, value if field_name.endswith("__isnull") else None))
+        return type(self), tuple(fields), self.ordering_fields
+
+    @property
+    def ordering_fields(self) -> tuple[str, ...]:
+        """
+        Поля сортировки. У фильтра, созданного напрямую, а не из параметров
+        запроса, незаданное поле хранит значение по умолчанию Query
+        """
+        values = getattr(self, self.Constants.ordering_field_name, None)
+        return tuple(values) if isinstance(values, list) else ()
+
+    @property
+    def plan(self) -> FilterPlan:
+        shape = self.shape
+        plan = self._plans.get(shape)
+        if plan is None:
+            plan = FilterPlan(
+                criteria=tuple(
+                    criterion(owner, field_name, value, param)
+                    for param, owner, field_name, value in self.filter_items()
+                ),
+                ordering=tuple(self.ordering()),
+            )
+            if len(self._plans) < self.max_plans:
+                self._plans[shape] = plan
+        return plan
+
+    def filter_params(self) -> dict[str, Any]:
+        """Значения параметров запроса для условий фильтра"""
+        params = {}
+        for param, owner, field_name, value in self.filter_items():
+            if not field_name.endswith("__isnull"):
+                params[param] = param_value(owner, field_name, value)
+        return params
+
+    def ordering(self) -> Iterator[ColumnElement[Any]]:
+        for field_name in self.ordering_fields:
+            column = getattr(self.Constants.model, field_name.lstrip("+-"))
+            yield column.desc() if field_name.startswith("-") else column.asc()
+
+    def filter(self, query: Select) -> Select:  # type: ignore[override]
+        return query.where(*self.plan.criteria)
+
+    def sort(self, query: Select) -> Select:  # type: ignore[override]
+        if not self.ordering_fields:
+            return query
+        return query.order_by(*self.plan.ordering)
+
+
+def is_search(owner: Filter, field_name: str) -> bool:
+    return field_name == owner.Constants.search_field_name and hasattr(
+        owner.Constants, "search_model_fields"
+    )
+
+
+def criterion(
+    owner: Filter,
+    field_name: str,
+    value: Any,
+    param: str,
+) -> ColumnElement[bool]:
+    """Условие отбора по полю фильтра со значением из параметра param"""
+    model = owner.Constants.model
+    if is_search(owner, field_name):
+        search: BindParameter[str] = bindparam(param)
+        return or_(
+            *(
+                getattr(model, model_field).ilike(search)
+                for model_field in owner.Constants.search_model_fields
+            )
+        )
+    model_field, _, operator = field_name.partition("__")
+    column = getattr(model, model_field)
+    if operator == "isnull":
+        return column.is_(None) if value else column.is_not(None)
+    if not operator:
+        return column == bindparam(param)
+    method, _ = _orm_operator_transformer[operator](value)
+    return getattr(column, method)(
+        bindparam(param, expanding=operator in ("in", "not_in"))
+    )
+
+
+def param_value(owner: Filter, field_name: str, value: Any) -> Any:
+    """Значение параметра запроса для условия по полю фильтра"""
+    if is_search(owner, field_name):
+        return f"%{value}%"
+    _, _, operator = field_name.partition("__")
+    if not operator:
+        return value
+    _, value = _orm_operator_transformer[operator](value)
+    return value
+
+
+def filter_params(filter_elm: Filter | None) -> dict[str, Any]:
+    if isinstance(filter_elm, PlannedFilter):
+        return filter_elm.filter_params()
+    return {}
+
+
+def parse_filter(filter_class: type[PlannedFilter], values: BaseModel) -> Any:
+    """
+    Создает фильтр из параметров запроса, полученных через FilterDepends.
+    Проверка выполняется один раз, а не при каждом вызове filter и sort
+    """
+    try:
+        return filter_class(**values.dict())
+    except ValidationError as e:
+        ordering_field = filter_class.Constants.ordering_field_name
+        if any(error["loc"][0] == ordering_field for error in e.errors()):
+            raise InvalidSortError(str(e)) from e
+        raise RequestValidationError(e.raw_errors) from e
@@ -0,0 +1,280 @@
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Iterable
+
+from sqlalchemy import Engine, Pool, event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+if TYPE_CHECKING:
+    # db импортирует пул из этого модуля, а utils.cache импортирует db
+    from utils.cache import AbstractCache
+
+# Верхние границы корзин гистограмм длительности, секунды
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Гистограмма значений с фиксированными границами корзин.
+    Запись выполняется в потоке цикла событий без await, поэтому блокировки
+    не нужны: наблюдение - это поиск корзины и три сложения
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict[str, Any]:
+        """Накопительные значения корзин, как в гистограммах Prometheus"""
+        buckets = {}
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class HttpMetrics:
+    """Количество, длительность и число выполняющихся HTTP запросов"""
+
+    def __init__(self) -> None:
+        self.requests: dict[tuple[str, str, int], int] = {}
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.in_progress: dict[str, int] = {}
+
+    def observe(self, method: str, route: str, status: int, duration: float) -> None:
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram(
+                LATENCY_BUCKETS_SECONDS
+            )
+        histogram.observe(duration)
+
+
+http_metrics = HttpMetrics()
+# Время получения соединения из пула, включая ожидание свободного соединения
+pool_checkout_seconds = Histogram(LATENCY_BUCKETS_SECONDS)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время выдачи соединения"""
+
+    def connect(self) -> PoolProxiedConnection:
+        started_at = time.perf_counter()
+        connection = super().connect()
+        pool_checkout_seconds.observe(time.perf_counter() - started_at)
+        return connection
+
+
+class StatementCacheMetrics:
+    """
+    Попадания в кэш скомпилированных запросов SQLAlchemy. Результат поиска
+    в кэше записывается в контекст выполнения запроса
+    """
+
+    results = {
+        CacheStats.CACHE_HIT: "hit",
+        CacheStats.CACHE_MISS: "miss",
+        CacheStats.CACHING_DISABLED: "disabled",
+        CacheStats.NO_CACHE_KEY: "no_cache_key",
+        CacheStats.NO_DIALECT_SUPPORT: "no_dialect_support",
+    }
+
+    def __init__(self) -> None:
+        self.requests: dict[str, int] = {}
+
+    def instrument(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def remove(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        if context is None:
+            return
+        result = self.results.get(context.cache_hit, "no_cache_key")
+        self.requests[result] = self.requests.get(result, 0) + 1
+
+    def hit_ratio(self) -> float | None:
+        hits = self.requests.get("hit", 0)
+        misses = self.requests.get("miss", 0)
+        if not hits + misses:
+            return None
+        return hits / (hits + misses)
+
+    @staticmethod
+    def cache_size(engine: Engine) -> int | None:
+        """
+        Количество записей в кэше скомпилированных запросов движка. Кэш не
+        входит в публичный API SQLAlchemy, без него размер не известен
+        """
+        compiled_cache = getattr(engine, "_compiled_cache", None)
+        if compiled_cache is None:
+            return None
+        try:
+            return len(compiled_cache)
+        except TypeError:
+            return None
+
+
+statement_cache_metrics = StatementCacheMetrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware, собирающее статистику HTTP запросов по маршрутам"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = http_metrics.in_progress
+        in_progress[method] = in_progress.get(method, 0) + 1
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress[method] -= 1
+            # Шаблон пути вместо самого пути, чтобы число меток было ограничено
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_metrics.observe(
+                method, route, status, time.perf_counter() - started_at
+            )
+
+
+def format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    items = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+        value = value.replace('"', '\\"')
+        items.append(f'{name}="{value}"')
+    return "{" + ",".join(items) + "}"
+
+
+def histogram_lines(
+    name: str,
+    histograms: Iterable[tuple[dict[str, Any], Histogram | dict[str, Any]]],
+) -> list[str]:
+    lines = [f"# TYPE {name} histogram"]
+    for labels, histogram in histograms:
+        data = histogram.to_dict() if isinstance(histogram, Histogram) else histogram
+        for bound, count in data["buckets"].items():
+            lines.append(
+                f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}"
+            )
+        lines.append(f"{name}_sum{format_labels(labels)} {data['sum']}")
+        lines.append(f"{name}_count{format_labels(labels)} {data['count']}")
+    return lines
+
+
+def render_metrics(
+    pool: Pool,
+    caches: dict[str, "AbstractCache | None"],
+    query_stats: list[dict[str, Any]] | None = None,
+    statement_cache_size: int | None = None,
+) -> str:
+    """Формирует метрики в текстовом формате Prometheus"""
+    lines = ["# TYPE http_requests_total counter"]
+    for (method, route, status), count in http_metrics.requests.items():
+        labels = {"method": method, "route": route, "status": status}
+        lines.append(f"http_requests_total{format_labels(labels)} {count}")
+    lines += histogram_lines(
+        "http_request_duration_seconds",
+        (
+            ({"method": method, "route": route}, histogram)
+            for (method, route), histogram in http_metrics.latency.items()
+        ),
+    )
+    lines.append("# TYPE http_requests_in_progress gauge")
+    for method, count in http_metrics.in_progress.items():
+        labels = {"method": method}
+        lines.append(f"http_requests_in_progress{format_labels(labels)} {count}")
+
+    lines += histogram_lines("db_pool_checkout_seconds", [({}, pool_checkout_seconds)])
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        lines.append("# TYPE db_pool_connections gauge")
+        for state, value in (
+            ("size", pool.size()),
+            ("checked_in", pool.checkedin()),
+            ("checked_out", pool.checkedout()),
+            ("overflow", pool.overflow()),
+        ):
+            lines.append(
+                f"db_pool_connections{format_labels({'state': state})} {value}"
+            )
+
+    lines.append("# TYPE cache_requests_total counter")
+    hit_ratios = []
+    for cache_name, cache in caches.items():
+        if cache is None:
+            continue
+        stats = cache.stats()
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            labels = {"cache": cache_name, "result": result}
+            lines.append(f"cache_requests_total{format_labels(labels)} {stats[key]}")
+        requests = stats["hits"] + stats["misses"]
+        if requests:
+            hit_ratios.append((cache_name, stats["hits"] / requests))
+    lines.append("# TYPE cache_hit_ratio gauge")
+    for cache_name, ratio in hit_ratios:
+        lines.append(f"cache_hit_ratio{format_labels({'cache': cache_name})} {ratio}")
+
+    lines.append("# TYPE db_statement_cache_requests_total counter")
+    for result, count in statement_cache_metrics.requests.items():
+        labels = {"result": result}
+        lines.append(
+            f"db_statement_cache_requests_total{format_labels(labels)} {count}"
+        )
+    hit_ratio = statement_cache_metrics.hit_ratio()
+    if hit_ratio is not None:
+        lines.append("# TYPE db_statement_cache_hit_ratio gauge")
+        lines.append(f"db_statement_cache_hit_ratio {hit_ratio}")
+    if statement_cache_size is not None:
+        lines.append("# TYPE db_statement_cache_entries gauge")
+        lines.append(f"db_statement_cache_entries {statement_cache_size}")
+
+    if query_stats is not None:
+        lines += histogram_lines(
+            "db_query_duration_milliseconds",
+            (
+                (
+                    {"route": elm["route"], "operation": elm["operation"]},
+                    elm["latency_ms"],
+                )
+                for elm in query_stats
+            ),
+        )
+        lines.append("# TYPE db_query_rows_total counter")
+        for elm in query_stats:
+            labels = {"route": elm["route"], "operation": elm["operation"]}
+            lines.append(f"db_query_rows_total{format_labels(labels)} {elm['rows']}")
+    return "\n".join(lines) + "\n"
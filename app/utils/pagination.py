@@ -0,0 +1,158 @@
+import base64
+import binascii
+import datetime
+import json
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from fastapi_filter.contrib.sqlalchemy import Filter
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    and_,
+    bindparam,
+    or_,
+    select,
+    tuple_,
+    DateTime,
+)
+
+from db import Base
+
+SortKeys = list[tuple[str, bool]]
+
+# Имя колонки с оконным COUNT(*) OVER() в строках страницы
+TOTAL_LABEL = "total"
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден или не соответствует текущей сортировке"""
+
+
+@dataclass
+class Page:
+    """Страница списка с общим количеством элементов и курсором следующей страницы"""
+
+    items: Sequence[Any]
+    total: int | None
+    next: str | None
+
+
+def get_sort_keys(filter_elm: Filter | None, tiebreaker: bool = True) -> SortKeys:
+    """
+    Возвращает список полей сортировки в виде пар (имя поля, по убыванию).
+    С tiebreaker последним ключом всегда идет id, чтобы порядок строк был однозначным
+    """
+    values = getattr(filter_elm, "order_by", None) or []
+    if isinstance(values, str):
+        values = values.split(",")
+    sort_keys = []
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        sort_keys.append((value.lstrip("+-"), value.startswith("-")))
+    if tiebreaker and "id" not in (field_name for field_name, _ in sort_keys):
+        sort_keys.append(("id", False))
+    return sort_keys
+
+
+def encode_cursor(elm: Any, sort_keys: SortKeys) -> str:
+    """
+    Кодирует значения ключей сортировки последней строки в непрозрачный курсор.
+    Для полей, которых нет в строке, записывается null, их значения берутся
+    из строки курсора при выполнении запроса, см. keyset_query()
+    """
+    data = [[field_name, getattr(elm, field_name, None)] for field_name, _ in sort_keys]
+    raw = json.dumps(data, default=datetime.datetime.isoformat, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, model: type[Base], sort_keys: SortKeys) -> list[Any]:
+    """Декодирует курсор и приводит значения к типам колонок модели"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        field_names = [field_name for field_name, _ in data]
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise InvalidCursorError("Не удалось прочитать курсор") from e
+    if field_names != [field_name for field_name, _ in sort_keys]:
+        raise InvalidCursorError("Курсор не соответствует сортировке")
+
+    values = []
+    for field_name, value in data:
+        column = getattr(model, field_name)
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.datetime.fromisoformat(value)
+            except (TypeError, ValueError) as e:
+                raise InvalidCursorError("Не удалось прочитать курсор") from e
+        values.append(value)
+    return values
+
+
+def cursor_params(values: list[Any]) -> dict[str, Any]:
+    """Значения курсора в виде параметров запроса из keyset_query"""
+    return {f"cursor_{i}": value for i, value in enumerate(values)}
+
+
+def keyset_query(query: Select, model: type[Base], sort_keys: SortKeys) -> Select:
+    """
+    Добавляет к запросу условие "строки после курсора".
+    При одинаковом направлении сортировки используется сравнение кортежей,
+    при смешанном - эквивалентное ему раскрытие через OR с ведущим
+    ограничением по первой колонке, чтобы поиск шел по индексу.
+    Значения курсора передаются параметрами из cursor_params(). Значения
+    полей, которых нет среди колонок запроса (например content в кратком
+    представлении), выбираются подзапросом из строки с id курсора
+    """
+    columns = [getattr(model, field_name) for field_name, _ in sort_keys]
+    selected = set(query.selected_columns.keys())
+    field_names = [field_name for field_name, _ in sort_keys]
+    cursor_id = bindparam(f"cursor_{field_names.index('id')}", type_=model.id.type)
+    cursor_row = model.__table__.alias("cursor_row")
+    values: list[ColumnElement[Any]] = []
+    for i, (field_name, column) in enumerate(zip(field_names, columns)):
+        if field_name == "id":
+            values.append(cursor_id)
+        elif field_name in selected:
+            values.append(bindparam(f"cursor_{i}", type_=column.type))
+        else:
+            values.append(
+                select(cursor_row.c[field_name])
+                .where(cursor_row.c.id == cursor_id)
+                .scalar_subquery()
+            )
+    directions = [desc for _, desc in sort_keys]
+    if len(set(directions)) == 1:
+        if directions[0]:
+            return query.where(tuple_(*columns) < tuple_(*values))
+        return query.where(tuple_(*columns) > tuple_(*values))
+
+    conditions = []
+    for i, (column, desc) in enumerate(zip(columns, directions)):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        after = column < values[i] if desc else column > values[i]
+        conditions.append(and_(*equal_prefix, after))
+    first_bound = columns[0] <= values[0] if directions[0] else columns[0] >= values[0]
+    return query.where(first_bound, or_(*conditions))
+
+
+def get_next_cursor(
+    elements: Sequence[Any],
+    filter_elm: Filter | None,
+    limit: int | None,
+) -> str | None:
+    """Возвращает курсор следующей страницы, если текущая страница заполнена"""
+    if not elements or limit is None or len(elements) < limit:
+        return None
+    return encode_cursor(elements[-1], get_sort_keys(filter_elm))
+
+
+def has_filters(filter_elm: Filter | None) -> bool:
+    """Проверяет, задано ли в фильтре хотя бы одно условие отбора"""
+    if filter_elm is None:
+        return False
+    values = filter_elm.dict(exclude_none=True, exclude_unset=True)
+    values.pop("order_by", None)
+    return any(value != {} for value in values.values())
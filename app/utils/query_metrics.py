@@ -0,0 +1,119 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from setings import settings
+from utils.metrics import Histogram
+
+logger = logging.getLogger("notes_api.sql")
+
+# Верхние границы корзин гистограммы длительности запросов, мс
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# ASGI scope текущего запроса. Маршрут записывается в scope роутером
+# после сопоставления пути, поэтому он читается в момент выполнения запроса к БД
+request_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    """Возвращает метод и шаблон пути маршрута, выполняющего запрос к БД"""
+    scope = request_scope.get()
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "-")
+    return f"{scope.get('method')} {path}"
+
+
+class QueryStats:
+    """Статистика запросов одного вида, выполненных одним маршрутом"""
+
+    def __init__(self) -> None:
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.rows = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"latency_ms": self.latency_ms.to_dict(), "rows": self.rows}
+
+
+class QueryMetrics:
+    """
+    Сбор длительности и количества строк запросов к БД по событиям
+    before/after_cursor_execute. Запросы дольше slow_query_ms
+    записываются в журнал notes_api.sql
+    """
+
+    def __init__(self, slow_query_ms: float = 200) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.queries: dict[tuple[str, str], QueryStats] = {}
+
+    def instrument(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def remove(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._query_started_at = time.perf_counter()
+
+    def after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        duration_ms = (time.perf_counter() - context._query_started_at) * 1000
+        route = current_route()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        stats = self.queries.get((route, operation))
+        if stats is None:
+            stats = self.queries[(route, operation)] = QueryStats()
+        stats.latency_ms.observe(duration_ms)
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+        if duration_ms >= self.slow_query_ms:
+            logger.warning(
+                "Медленный запрос %.1f мс: %s",
+                duration_ms,
+                statement,
+                extra={
+                    "route": route,
+                    "duration_ms": duration_ms,
+                    "rowcount": cursor.rowcount,
+                    "statement": statement,
+                },
+            )
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {"route": route, "operation": operation, **stats.to_dict()}
+            for (route, operation), stats in self.queries.items()
+        ]
+
+    def reset(self) -> None:
+        self.queries.clear()
+
+
+class QueryRouteMiddleware:
+    """ASGI middleware, связывающее запросы к БД с маршрутом HTTP запроса"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+
+
+query_metrics = QueryMetrics(slow_query_ms=settings.DB_SLOW_QUERY_MS)
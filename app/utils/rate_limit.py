@@ -0,0 +1,172 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from fastapi import HTTPException, Request, status
+
+from setings import settings
+
+# Длительность периодов ограничения в секундах
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# Атомарное обновление корзины в Redis: KEYS[1] - ключ корзины,
+# ARGV - скорость пополнения в секунду и емкость. Возвращает время
+# ожидания в секундах, 0 - запрос разрешен
+REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now_time = redis.call('TIME')
+local now = tonumber(now_time[1]) + tonumber(now_time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+def parse_limit(value: str) -> tuple[float, int]:
+    """
+    Разбирает ограничение вида "количество/период", например "60/minute".
+    Возвращает скорость пополнения корзины в секунду и ее емкость
+    """
+    count, _, period = value.partition("/")
+    capacity = int(count)
+    if capacity <= 0 or period not in PERIODS:
+        raise ValueError(f"Не корректное ограничение частоты запросов: {value}")
+    return capacity / PERIODS[period], capacity
+
+
+class AbstractRateLimitBackend(ABC):
+    """Хранилище корзин токенов"""
+
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, capacity: int) -> float:
+        """
+        Забирает токен из корзины key. Возвращает 0, если токен получен,
+        иначе время в секундах до появления токена
+        """
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(AbstractRateLimitBackend):
+    """
+    Корзины в памяти процесса. Давно не использованные корзины вытесняются
+    по LRU, за это время они успевают заполниться, поэтому вытеснение
+    не ослабляет ограничение
+    """
+
+    def __init__(self, max_size: int = 100000) -> None:
+        self.max_size = max_size
+        # Ключ - [количество токенов, время последнего обновления]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, capacity: int) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+
+class RedisRateLimitBackend(AbstractRateLimitBackend):
+    """Корзины в Redis, общие для всех воркеров и экземпляров приложения"""
+
+    def __init__(self, client: Any, prefix: str = "rate_limit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(REDIS_TOKEN_BUCKET)
+
+    async def acquire(self, key: str, rate: float, capacity: int) -> float:
+        retry_after = await self._script(
+            keys=[self.prefix + key], args=[rate, capacity]
+        )
+        return float(retry_after)
+
+
+class RateLimiter:
+    """Ограничение частоты запросов по группам маршрутов"""
+
+    def __init__(
+        self,
+        backend: AbstractRateLimitBackend,
+        limits: dict[str, str],
+    ) -> None:
+        self.backend = backend
+        self.limits = {name: parse_limit(value) for name, value in limits.items()}
+
+    async def retry_after(self, name: str, key: str) -> float:
+        """Время ожидания до следующего запроса группы name, 0 - запрос разрешен"""
+        rate, capacity = self.limits[name]
+        return await self.backend.acquire(f"{name}:{key}", rate, capacity)
+
+
+def create_rate_limiter() -> RateLimiter | None:
+    """Создает ограничение частоты запросов по настройке RATE_LIMIT_BACKEND"""
+    backend: AbstractRateLimitBackend
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        backend = MemoryRateLimitBackend(max_size=settings.RATE_LIMIT_MAX_KEYS)
+    elif settings.RATE_LIMIT_BACKEND == "redis":
+        # Необязательная зависимость, не входит в pyproject.toml и
+        # устанавливается отдельно: pip install redis
+        from redis.asyncio import Redis  # type: ignore[import]
+
+        backend = RedisRateLimitBackend(Redis.from_url(settings.REDIS_URL))
+    else:
+        return None
+    return RateLimiter(
+        backend,
+        limits={
+            "list": settings.RATE_LIMIT_LIST,
+            "write": settings.RATE_LIMIT_WRITE,
+            "bulk": settings.RATE_LIMIT_BULK,
+            "export": settings.RATE_LIMIT_EXPORT,
+        },
+    )
+
+
+rate_limiter = create_rate_limiter()
+
+
+class RateLimit:
+    """
+    Зависимость, ограничивающая частоту запросов группы маршрутов name
+    с одного IP адреса. При превышении возвращается 429 с Retry-After
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    async def __call__(self, request: Request) -> None:
+        client = request.client
+        await self.check(f"ip:{client.host if client else ''}")
+
+    async def check(self, key: str) -> None:
+        if rate_limiter is None:
+            return
+        retry_after = await rate_limiter.retry_after(self.name, key)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Превышено количество запросов, повторите позже",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
@@ -1,10 +1,49 @@
 from abc import ABC, abstractmethod
-from typing import Any, Sequence
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Hashable,
+    Iterator,
+    Sequence,
+    TypeVar,
+)
 
 from fastapi_filter.contrib.sqlalchemy import Filter
-from sqlalchemy import insert, select, update, delete, Select
+from sqlalchemy import (
+    insert,
+    select,
+    update,
+    delete,
+    func,
+    text,
+    bindparam,
+    Executable,
+    Integer,
+    Result,
+    Select,
+    Row,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import async_session_maker, Base
+from db import Base
+from utils.cache import AbstractCache, dump_model, load_model
+from utils.filters import PlannedFilter, filter_params
+from utils.pagination import (
+    TOTAL_LABEL,
+    Page,
+    cursor_params,
+    get_sort_keys,
+    decode_cursor,
+    keyset_query,
+    get_next_cursor,
+    has_filters,
+)
+
+StatementT = TypeVar("StatementT", bound=Executable)
+
+# Заранее построенные выражения запросов по классу репозитория и имени
+_statements: dict[tuple[type, Hashable], Any] = {}
 
 
 class AbstractRepository(ABC):
@@ -32,57 +71,325 @@ class AbstractRepository(ABC):
 
 
 class SQLAlchemyRepository(AbstractRepository):
+    """
+    Репозиторий работает в сессии запроса, которая передается через зависимость
+    get_async_session, поэтому все обращения к БД в рамках одного запроса
+    используют одно соединение из пула
+    """
+
     model = Base
+    # Количество строк в одном запросе при массовых операциях
+    bulk_chunk_size = 1000
+    # Количество строк, получаемых из серверного курсора за один раз
+    stream_chunk_size = 500
+    # Количество запоминаемых выражений запросов всех репозиториев
+    max_statements = 2000
+    # Кэш find_one, записи обновляются и удаляются при изменении объектов
+    cache: AbstractCache | None = None
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
 
     async def add_one(self, **kwargs) -> Any:
-        async with async_session_maker() as session:
-            stmt = insert(self.model).values(**kwargs).returning(self.model)
-            res = await session.execute(stmt)
-            await session.commit()
-            return res.scalar()
+        stmt = insert(self.model).values(**kwargs).returning(self.model)
+        res = await self.session.execute(stmt)
+        await self.session.commit()
+        elm: Any = res.scalar()
+        if self.cache is not None and elm is not None:
+            await self.cache.set(self.cache_key(elm.id), dump_model(elm))
+        return elm
+
+    async def add_many(self, values: list[dict]) -> Sequence[Any]:
+        """Создает объекты многострочными INSERT ... RETURNING в одной транзакции"""
+        elms: list[Any] = []
+        stmt = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        for chunk in self.chunks(values):
+            res = await self.session.scalars(stmt, chunk)
+            elms.extend(res.all())
+        await self.session.commit()
+        return elms
 
     async def find_one(self, elm_id: int) -> Any | None:
-        async with async_session_maker() as session:
-            query = select(self.model).where(self.model.id == elm_id)
-            res = await session.execute(query)
-            return res.scalar_one_or_none()
+        generation = None
+        if self.cache is not None:
+            data = await self.cache.get(self.cache_key(elm_id))
+            if data is not None:
+                return load_model(self.model, data)
+            # Объект, измененный после чтения, не попадет в кэш устаревшим
+            generation = await self.cache.generation(self.cache_key(elm_id))
+        query = self.statement(
+            "find_one",
+            lambda: select(self.model).where(self.model.id == bindparam("elm_id")),
+        )
+        res = await self.session.execute(query, {"elm_id": elm_id})
+        elm = res.scalar_one_or_none()
+        # Реплика может отставать, поэтому кэш заполняется только из основной БД
+        if self.cache is not None and elm is not None and not self.is_replica:
+            await self.cache.set(
+                self.cache_key(elm_id), dump_model(elm), generation=generation
+            )
+        return elm
+
+    async def exists(self, elm_id: int) -> bool:
+        query = self.statement(
+            "exists",
+            lambda: select(self.model.id).where(self.model.id == bindparam("elm_id")),
+        )
+        res = await self.session.execute(query, {"elm_id": elm_id})
+        return res.scalar_one_or_none() is not None
+
+    async def find_existing_ids(self, elm_ids: list[int]) -> set[int]:
+        """Возвращает идентификаторы из списка, для которых существуют объекты"""
+        existing_ids: set[int] = set()
+        for chunk in self.chunks(elm_ids):
+            query = select(self.model.id).where(self.model.id.in_(chunk))
+            res = await self.session.execute(query)
+            existing_ids.update(res.scalars().all())
+        return existing_ids
 
     async def update_elm(self, elm_id: int, **kwargs) -> bool:
-        async with async_session_maker() as session:
-            stmt = update(self.model).where(self.model.id == elm_id)
-            if kwargs is not None:
-                stmt = stmt.values(**kwargs)
-            res = await session.execute(stmt)
-            await session.commit()
-            return res.rowcount > 0
+        names = sorted(kwargs)
+        stmt = self.statement(
+            f"update_elm:{','.join(names)}",
+            lambda: update(self.model)
+            .where(self.model.id == bindparam("elm_id"))
+            .values({name: bindparam(f"value_{name}") for name in names})
+            .execution_options(synchronize_session=False),
+        )
+        params = {f"value_{name}": value for name, value in kwargs.items()}
+        res = await self.session.execute(stmt, {"elm_id": elm_id, **params})
+        await self.session.commit()
+        await self.invalidate(elm_id)
+        return res.rowcount > 0
 
     async def delete_elm(self, elm_id: int) -> bool:
-        async with async_session_maker() as session:
-            stmt = delete(self.model).where(self.model.id == elm_id)
-            res = await session.execute(stmt)
-            await session.commit()
-            return res.rowcount > 0
+        stmt = self.statement(
+            "delete_elm",
+            lambda: delete(self.model)
+            .where(self.model.id == bindparam("elm_id"))
+            .execution_options(synchronize_session=False),
+        )
+        res = await self.session.execute(stmt, {"elm_id": elm_id})
+        await self.session.commit()
+        await self.invalidate(elm_id)
+        return res.rowcount > 0
+
+    def statement(
+        self,
+        name: Hashable,
+        build: Callable[[], StatementT],
+    ) -> StatementT:
+        """
+        Возвращает выражение запроса, построенное build при первом вызове.
+        Значения передаются параметрами bindparam при выполнении, поэтому
+        выражение не строится заново, а ключ кэша скомпилированных запросов
+        SQLAlchemy вычисляется для него один раз
+        """
+        key = (type(self), name)
+        stmt = _statements.get(key)
+        if stmt is None:
+            stmt = build()
+            if len(_statements) < self.max_statements:
+                _statements[key] = stmt
+        return stmt
+
+    @property
+    def is_replica(self) -> bool:
+        return bool(self.session.info.get("replica"))
+
+    def chunks(self, items: list) -> Iterator[list]:
+        for i in range(0, len(items), self.bulk_chunk_size):
+            yield items[i : i + self.bulk_chunk_size]
+
+    def cache_key(self, elm_id: int) -> str:
+        return f"{self.model.__tablename__}:{elm_id}"
+
+    async def invalidate(self, elm_id: int) -> None:
+        """Удаляет объект из кэша после его изменения"""
+        if self.cache is not None:
+            await self.cache.delete(self.cache_key(elm_id))
 
     def find_all(self, limit: int, page: int):
         query = self.get_query()
         return self.pagination_query(query=query, limit=limit, page=page)
 
-    @staticmethod
     async def _find_elements(
-        query: Select,
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
         filter_elm: Filter | None,
         limit: int,
         page: int,
+        cursor: str | None = None,
     ) -> Sequence[Any]:
-        skip = (page - 1) * limit
-        async with async_session_maker() as session:
+        res = await self._execute_list(
+            name=name,
+            build_query=build_query,
+            filter_elm=filter_elm,
+            limit=limit,
+            page=page,
+            cursor=cursor,
+        )
+        return res.scalars().all()
+
+    async def _find_rows(
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
+        filter_elm: Filter | None,
+        limit: int,
+        page: int,
+        cursor: str | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> Sequence[Row]:
+        """Возвращает строки выбранных колонок без создания объектов модели"""
+        res = await self._execute_list(
+            name=name,
+            build_query=build_query,
+            filter_elm=filter_elm,
+            limit=limit,
+            page=page,
+            cursor=cursor,
+            params=params,
+        )
+        return res.all()
+
+    async def _find_page(
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
+        filter_elm: Filter | None,
+        limit: int,
+        page: int,
+        cursor: str | None = None,
+        exact_total: bool = False,
+        scalars: bool = False,
+        params: dict[str, Any] | None = None,
+    ) -> Page:
+        """
+        Возвращает страницу вместе с общим количеством элементов.
+        Для списка без фильтров по умолчанию берется оценка из статистики
+        таблицы, иначе количество считается окном COUNT(*) OVER() в том же
+        запросе. При переданном курсоре окно посчитало бы только строки
+        после курсора, поэтому точное количество не возвращается
+        """
+        total = None
+        if not exact_total and not has_filters(filter_elm):
+            total = await self.estimated_count()
+        count_in_query = total is None and cursor is None
+        res = await self._execute_list(
+            name=name,
+            build_query=build_query,
+            filter_elm=filter_elm,
+            limit=limit,
+            page=page,
+            cursor=cursor,
+            params=params,
+            with_total=count_in_query,
+        )
+        rows = res.all()
+        if count_in_query:
+            if rows:
+                total = rows[0][-1]
+            elif page == 1:
+                total = 0
+        items = [row[0] for row in rows] if scalars else rows
+        return Page(
+            items=items,
+            total=total,
+            next=get_next_cursor(items, filter_elm, limit),
+        )
+
+    async def _execute_list(
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
+        filter_elm: Filter | None,
+        limit: int,
+        page: int,
+        cursor: str | None = None,
+        params: dict[str, Any] | None = None,
+        with_total: bool = False,
+    ) -> Result:
+        query = self.elements_query(
+            name=name,
+            build_query=build_query,
+            filter_elm=filter_elm,
+            cursor=cursor is not None,
+            with_total=with_total,
+        )
+        params = {
+            **self.elements_params(filter_elm, limit, page, cursor),
+            **(params or {}),
+        }
+        return await self.session.execute(query, params)
+
+    async def estimated_count(self) -> int | None:
+        """
+        Оценка количества строк таблицы по статистике pg_class.reltuples.
+        Для таблицы без собранной статистики возвращает None
+        """
+        query = text(
+            "SELECT CAST(reltuples AS bigint) FROM pg_class "
+            "WHERE oid = to_regclass(:name)"
+        )
+        res = await self.session.execute(query, {"name": self.model.__tablename__})
+        estimate = res.scalar_one_or_none()
+        if estimate is None or estimate <= 0:
+            return None
+        return estimate
+
+    def elements_query(
+        self,
+        name: Hashable,
+        build_query: Callable[[], Select],
+        filter_elm: Filter | None,
+        cursor: bool = False,
+        with_total: bool = False,
+    ) -> Select:
+        """
+        Запрос страницы списка, построенный из запроса build_query.
+        Значения фильтра, размер страницы, смещение и значения курсора
+        передаются параметрами, поэтому запрос строится один раз для
+        каждой формы фильтра и способа пагинации
+        """
+
+        def build() -> Select:
+            query = build_query()
+            if with_total:
+                query = query.add_columns(func.count().over().label(TOTAL_LABEL))
             if filter_elm is not None:
                 query = filter_elm.filter(query)
                 if hasattr(filter_elm, "order_by"):
                     query = filter_elm.sort(query)
-            query = query.limit(limit).offset(skip)
-            res = await session.execute(query)
-            return res.scalars().all()
+            return self.keyset_pagination_query(
+                query=query,
+                filter_elm=filter_elm,
+                cursor=cursor,
+            )
+
+        if filter_elm is not None and not isinstance(filter_elm, PlannedFilter):
+            # Значения обычного фильтра подставляются в сам запрос
+            return build()
+        shape = None if filter_elm is None else filter_elm.shape
+        return self.statement(("list", name, shape, cursor, with_total), build)
+
+    def elements_params(
+        self,
+        filter_elm: Filter | None,
+        limit: int,
+        page: int,
+        cursor: str | None = None,
+    ) -> dict[str, Any]:
+        """Значения параметров запроса страницы списка"""
+        params = {"limit": limit, **filter_params(filter_elm)}
+        if cursor is None:
+            params["offset"] = (page - 1) * limit
+        else:
+            sort_keys = get_sort_keys(filter_elm)
+            values = decode_cursor(cursor, self.model, sort_keys)
+            params.update(cursor_params(values))
+        return params
 
     def get_query(self) -> Select:
         return select(self.model)
@@ -92,15 +399,79 @@ class SQLAlchemyRepository(AbstractRepository):
         skip = (page - 1) * limit
         return query.limit(limit).offset(skip)
 
+    def keyset_pagination_query(
+        self,
+        query: Select,
+        filter_elm: Filter | None,
+        cursor: bool = False,
+    ) -> Select:
+        """
+        Дополняет сортировку по id для однозначного порядка строк.
+        С курсором вместо OFFSET выбираются строки после значений курсора.
+        Размер страницы, смещение и значения курсора передаются параметрами
+        limit, offset и cursor_<номер ключа сортировки>
+        """
+        query = self.tiebreaker_query(query=query, filter_elm=filter_elm)
+        limit = bindparam("limit", type_=Integer)
+        if not cursor:
+            return query.limit(limit).offset(bindparam("offset", type_=Integer))
+        sort_keys = get_sort_keys(filter_elm)
+        return keyset_query(query, self.model, sort_keys).limit(limit)
+
+    def tiebreaker_query(self, query: Select, filter_elm: Filter | None) -> Select:
+        """Дополняет сортировку по id, если она не задана фильтром явно"""
+        if len(get_sort_keys(filter_elm)) > len(
+            get_sort_keys(filter_elm, tiebreaker=False)
+        ):
+            query = query.order_by(self.model.id)
+        return query
+
+    async def stream_elements(
+        self,
+        filter_elm: Filter | None = None,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Выдает строки пачками через серверный курсор, не загружая
+        весь результат запроса в память
+        """
+        query = select(*self.model.__table__.columns)
+        if filter_elm is not None:
+            query = filter_elm.filter(query)
+            if hasattr(filter_elm, "order_by"):
+                query = filter_elm.sort(query)
+        query = self.tiebreaker_query(query=query, filter_elm=filter_elm)
+        res = await self.session.stream(
+            query.execution_options(yield_per=self.stream_chunk_size),
+            filter_params(filter_elm),
+        )
+        async for rows in res.partitions():
+            yield rows
+
     async def find_elements(
         self,
         filter_elm: Filter | None = None,
         limit: int = 25,
         page: int = 1,
-    ) -> Sequence[Any]:
+        cursor: str | None = None,
+        with_total: bool = False,
+        exact_total: bool = False,
+    ) -> Sequence[Any] | Page:
+        if with_total:
+            return await self._find_page(
+                name="elements",
+                build_query=self.get_query,
+                filter_elm=filter_elm,
+                limit=limit,
+                page=page,
+                cursor=cursor,
+                exact_total=exact_total,
+                scalars=True,
+            )
         return await self._find_elements(
-            query=self.get_query(),
+            name="elements",
+            build_query=self.get_query,
             filter_elm=filter_elm,
             limit=limit,
             page=page,
+            cursor=cursor,
         )
@@ -0,0 +1,35 @@
+from typing import Any, Sequence
+
+import orjson
+from fastapi import Response
+from sqlalchemy import Row
+
+from utils.pagination import TOTAL_LABEL, Page
+
+
+def item_dict(item: Any) -> dict:
+    """Поля строки результата запроса или объекта модели"""
+    if isinstance(item, Row):
+        return item._asdict()
+    return {column.key: getattr(item, column.key) for column in item.__table__.columns}
+
+
+class RowsJSONResponse(Response):
+    """
+    Ответ со списком строк результата запроса, сериализованных orjson.
+    Строки кодируются напрямую, без создания и валидации pydantic моделей.
+    Страница с общим количеством отдается объектом {items, total, next},
+    ее элементами могут быть и объекты модели
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Sequence[Row] | Page) -> bytes:
+        if isinstance(content, Page):
+            items = [item_dict(item) for item in content.items]
+            for item in items:
+                item.pop(TOTAL_LABEL, None)
+            return orjson.dumps(
+                {"items": items, "total": content.total, "next": content.next}
+            )
+        return orjson.dumps([row._asdict() for row in content])
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger("notes_api.write_behind")
+
+# Запись накопленных изменений с одной областью записи scope, например
+# владельцем, с правами которого они записываются: {id объекта: значения полей}
+WriteFunc = Callable[[Any, dict[int, dict[str, Any]]], Awaitable[None]]
+
+
+class WriteBehindQueue:
+    """
+    Очередь отложенной записи изменений в памяти процесса.
+    Изменения одного объекта, переданные в течение delay секунд, объединяются
+    и записываются одним вызовом write для всех накопленных объектов с одной
+    областью записи.
+    Если запись не удалась из-за ошибки из permanent_errors, изменения
+    записываются по одному объекту, и отбрасываются с записью в журнал только
+    те, запись которых снова не удалась. При остальных ошибках, например
+    потере соединения, изменения возвращаются в очередь и записываются
+    повторно с увеличивающейся задержкой, но не более max_retries раз
+    """
+
+    # Наибольшая задержка повторной записи, с
+    max_retry_delay = 10.0
+
+    def __init__(
+        self,
+        write: WriteFunc,
+        delay: float = 0.5,
+        max_pending: int = 1000,
+        max_retries: int = 5,
+        permanent_errors: tuple[type[Exception], ...] = (),
+    ) -> None:
+        self.write = write
+        self.delay = delay
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.permanent_errors = permanent_errors
+        # Id объекта - область записи и новые значения полей
+        self.pending: dict[int, tuple[Hashable, dict[str, Any]]] = {}
+        # Количество неудачных попыток записи изменений объекта
+        self.attempts: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        self._retry_delay = 0.0
+
+    def __contains__(self, elm_id: int) -> bool:
+        return elm_id in self.pending
+
+    async def put(
+        self,
+        elm_id: int,
+        values: dict[str, Any],
+        scope: Hashable = None,
+    ) -> None:
+        """
+        Добавляет изменение, более поздние значения полей заменяют ранние.
+        Изменения объекта с другой областью записи не объединяются,
+        накопленные изменения сначала записываются
+        """
+        pending = self.pending.get(elm_id)
+        if pending is not None and pending[0] != scope:
+            await self.flush(elm_id)
+            pending = self.pending.get(elm_id)
+        if pending is None:
+            self.pending[elm_id] = (scope, dict(values))
+        else:
+            pending[1].update(values)
+        # Во время ожидания повторной записи очередь не записывается досрочно
+        if len(self.pending) >= self.max_pending and not self._retry_delay:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._schedule(self.delay)
+
+    def discard(self, *elm_ids: int) -> None:
+        """Отменяет не записанные изменения, например после удаления объекта"""
+        for elm_id in elm_ids:
+            self.pending.pop(elm_id, None)
+            self.attempts.pop(elm_id, None)
+
+    async def flush(self, *elm_ids: int) -> None:
+        """
+        Записывает накопленные изменения переданных объектов,
+        без аргументов - все накопленные изменения
+        """
+        async with self._lock:
+            if elm_ids:
+                batch = {
+                    elm_id: self.pending.pop(elm_id)
+                    for elm_id in elm_ids
+                    if elm_id in self.pending
+                }
+            else:
+                batch, self.pending = self.pending, {}
+            scopes: dict[Hashable, dict[int, dict[str, Any]]] = {}
+            for elm_id, (scope, values) in batch.items():
+                scopes.setdefault(scope, {})[elm_id] = values
+            failed = {}
+            for scope, updates in scopes.items():
+                failed.update(await self._write(scope, updates))
+            if not elm_ids:
+                self._retry_delay = 0.0
+            if failed:
+                self._requeue(failed)
+
+    async def _write(
+        self,
+        scope: Hashable,
+        updates: dict[int, dict[str, Any]],
+    ) -> dict[int, tuple[Hashable, dict[str, Any]]]:
+        """Записывает изменения, возвращает изменения для повторной записи"""
+        try:
+            await self.write(scope, updates)
+        except self.permanent_errors:
+            if len(updates) == 1:
+                for elm_id, values in updates.items():
+                    self.attempts.pop(elm_id, None)
+                    logger.exception(
+                        "Изменения объекта %s отброшены: %s", elm_id, values
+                    )
+                return {}
+            logger.exception(
+                "Ошибка отложенной записи %s объектов, запись по одному",
+                len(updates),
+            )
+            failed = {}
+            for elm_id, values in updates.items():
+                failed.update(await self._write(scope, {elm_id: values}))
+            return failed
+        except Exception:
+            logger.exception(
+                "Ошибка отложенной записи %s объектов, повтор позже",
+                len(updates),
+            )
+            return {elm_id: (scope, values) for elm_id, values in updates.items()}
+        for elm_id in updates:
+            self.attempts.pop(elm_id, None)
+        return {}
+
+    def _requeue(self, failed: dict[int, tuple[Hashable, dict[str, Any]]]) -> None:
+        """
+        Возвращает изменения в очередь перед более новыми изменениями
+        тех же объектов и назначает повторную запись
+        """
+        max_attempts = 0
+        for elm_id, (scope, values) in failed.items():
+            attempts = self.attempts.get(elm_id, 0) + 1
+            if attempts > self.max_retries:
+                self.attempts.pop(elm_id, None)
+                logger.error(
+                    "Изменения объекта %s отброшены после %s попыток записи: %s",
+                    elm_id,
+                    self.max_retries,
+                    values,
+                )
+                continue
+            newer = self.pending.get(elm_id)
+            if newer is not None and newer[0] != scope:
+                # Изменения с другой областью записи нельзя объединить,
+                # более новые изменения объекта записываются без них
+                logger.error(
+                    "Изменения объекта %s отброшены, объект изменен повторно: %s",
+                    elm_id,
+                    values,
+                )
+                continue
+            self.attempts[elm_id] = attempts
+            max_attempts = max(max_attempts, attempts)
+            if newer is not None:
+                values = {**values, **newer[1]}
+            self.pending[elm_id] = (scope, values)
+        if max_attempts:
+            self._retry_delay = min(
+                self.delay * 2**max_attempts, self.max_retry_delay
+            )
+            self._schedule(self._retry_delay)
+
+    def _schedule(self, delay: float) -> None:
+        timer = self._timer
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        self._timer = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    async def close(self) -> None:
+        """
+        Останавливает таймер и записывает все накопленные изменения,
+        повторяя запись, пока не закончатся попытки
+        """
+        while self.pending:
+            await self.flush()
+            if self.pending:
+                await asyncio.sleep(self._retry_delay)
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
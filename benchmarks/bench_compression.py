@@ -0,0 +1,95 @@
+"""
+Размер ответа и процессорное время на запрос для страниц списка заметок.
+
+Для страниц из 25 и 50 заметок с коротким, средним и длинным content
+сравнивает сериализацию json (JSONResponse) и orjson (ORJSONResponse),
+а также размер и время сжатия тела gzip и brotli (если установлен пакет
+brotli) с настройками CompressionMiddleware по умолчанию.
+
+Запуск из корня проекта: python benchmarks/bench_compression.py
+"""
+import datetime
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from utils.compression import (  # noqa: E402
+    CompressionMiddleware,
+    available_encodings,
+)
+
+WORDS = (
+    "заметка список задача встреча проект отчет идея покупки звонок письмо "
+    "note meeting project report idea task list call email draft"
+).split()
+CONTENT_WORDS = {"short": 10, "medium": 80, "long": 800}
+LIMITS = (25, 50)
+NUMBER = 200
+
+
+def make_page(limit: int, words: int) -> list[dict]:
+    now = datetime.datetime(2024, 1, 1)
+    return [
+        {
+            "id": i,
+            "title": f"Заметка {i}",
+            "content": " ".join(random.choices(WORDS, k=words)),
+            "created_at": (now + datetime.timedelta(minutes=i)).isoformat(),
+            "updated_at": (now + datetime.timedelta(minutes=i)).isoformat(),
+            "user_name": f"user_{i % 10}",
+        }
+        for i in range(limit)
+    ]
+
+
+def cpu_time_us(func: Callable[[], bytes]) -> float:
+    """Наименьшее процессорное время одного вызова из пяти серий, мкс"""
+    timings = []
+    for _ in range(5):
+        started_at = time.process_time()
+        for _ in range(NUMBER):
+            func()
+        timings.append(time.process_time() - started_at)
+    return min(timings) / NUMBER * 1e6
+
+
+def compress(middleware: CompressionMiddleware, encoding: str, body: bytes) -> bytes:
+    encoder = middleware.create_encoder(encoding)
+    return encoder.compress(body) + encoder.finish()
+
+
+def main() -> None:
+    random.seed(0)
+    middleware = CompressionMiddleware(app=None)  # type: ignore[arg-type]
+    print(
+        f"{'страница':>16} {'кодирование':>14} {'байт':>8} "
+        f"{'мкс json':>9} {'мкс сжатия':>11}"
+    )
+    for limit in LIMITS:
+        for size, words in CONTENT_WORDS.items():
+            page = make_page(limit, words)
+            name = f"{limit} x {size}"
+            for response_class in (JSONResponse, ORJSONResponse):
+                body = response_class(page).body
+                render_us = cpu_time_us(lambda: response_class(page).body)
+                print(
+                    f"{name:>16} {response_class.__name__:>14} {len(body):>8} "
+                    f"{render_us:>9.1f} {'-':>11}"
+                )
+            for encoding in available_encodings():
+                compressed = compress(middleware, encoding, body)
+                compress_us = cpu_time_us(lambda: compress(middleware, encoding, body))
+                print(
+                    f"{name:>16} {encoding:>14} {len(compressed):>8} "
+                    f"{'-':>9} {compress_us:>11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Процессорное время процесса приложения на один вызов find_one без кэша.
+
+Сравнивает построение запроса при каждом вызове (как было раньше)
+с заранее построенным выражением репозитория, а также выполнение
+без кэша подготовленных выражений asyncpg. Время процессора не включает
+работу сервера PostgreSQL, поэтому показывает накладные расходы Python.
+
+Запуск из корня проекта (используется БД из .test.env):
+    python benchmarks/bench_find_one.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "app"))
+
+NUMBER = 2000
+REPEAT = 5
+
+
+async def measure(engine: Any, repository_class: type, note_id: int) -> float:
+    """Наименьшее процессорное время одного вызова из REPEAT серий, мкс"""
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    timings = []
+    async with AsyncSession(engine) as session:
+        repository = repository_class(session)
+        # Прогрев кэшей SQLAlchemy и asyncpg
+        for _ in range(10):
+            await repository.find_one(note_id)
+        for _ in range(REPEAT):
+            started_at = time.process_time()
+            for _ in range(NUMBER):
+                await repository.find_one(note_id)
+                session.expunge_all()
+            timings.append(time.process_time() - started_at)
+    return min(timings) / NUMBER * 1e6
+
+
+async def main() -> None:
+    load_dotenv(ROOT_DIR / ".test.env", override=True)
+    from setings import settings
+
+    # Схема БД пересоздается, поэтому запуск разрешен только на тестовой БД
+    if settings.MODE != "TEST":
+        raise SystemExit("Тест запускается только с MODE=TEST")
+
+    from sqlalchemy import insert, select
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from auth.models import User
+    from db import Base, async_engine
+    from note_app.models import Note
+    from note_app.repositorie import NotesRepository
+
+    class UncachedRepository(NotesRepository):
+        cache = None
+
+    class RebuiltQueryRepository(UncachedRepository):
+        async def find_one(self, elm_id: int) -> Any | None:
+            query = select(self.model).where(self.model.id == elm_id)
+            res = await self.session.execute(query)
+            return res.scalar_one_or_none()
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        user_id = (
+            await conn.execute(
+                insert(User).returning(User.__table__.c.id),
+                {
+                    "email": "bench@example.com",
+                    "hashed_password": "x",
+                    "user_name": "bench",
+                },
+            )
+        ).scalar_one()
+        note_id = (
+            await conn.execute(
+                insert(Note).returning(Note.id),
+                {"title": "bench", "content": "bench", "user_id": user_id},
+            )
+        ).scalar_one()
+
+    no_prepared_cache = create_async_engine(
+        settings.ASYNC_SQL_URL,
+        connect_args={"prepared_statement_cache_size": 0},
+    )
+    variants = {
+        "rebuilt query": (async_engine, RebuiltQueryRepository),
+        "statement template": (async_engine, UncachedRepository),
+        "template, no prepared cache": (no_prepared_cache, UncachedRepository),
+    }
+    try:
+        results = {}
+        for name, (engine, repository_class) in variants.items():
+            results[name] = await measure(engine, repository_class, note_id)
+            print(f"{name:>28}: {results[name]:7.1f} мкс на вызов")
+        saved = results["rebuilt query"] - results["statement template"]
+        print(f"{'экономия':>28}: {saved:7.1f} мкс на вызов")
+    finally:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await async_engine.dispose()
+        await no_prepared_cache.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Время импорта приложения и память процесса воркера.
+
+Сравнивает импорт main в текущем виде с импортом, после которого создается
+синхронный движок с psycopg2, как это происходило раньше при импорте db.
+Каждый вариант запускается в отдельном процессе.
+
+Запуск из корня проекта: python benchmarks/bench_import.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+REPEAT = 10
+
+PROBE = """
+import resource, sys, time
+started_at = time.perf_counter()
+import main
+{extra}
+elapsed = time.perf_counter() - started_at
+print(
+    elapsed,
+    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "psycopg2" in sys.modules,
+)
+"""
+
+VARIANTS = {
+    "async_only": "",
+    "with_sync_engine": "from db import get_sync_engine; get_sync_engine()",
+}
+
+
+def measure(extra: str) -> dict[str, float | bool]:
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR / "app")}
+    times, rss = [], []
+    psycopg2_loaded = False
+    for _ in range(REPEAT):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(extra=extra)],
+            cwd=ROOT_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        rss.append(int(output[1]))
+        psycopg2_loaded = output[2] == "True"
+    return {
+        "import_ms": round(statistics.median(times) * 1000, 1),
+        "max_rss_mb": round(statistics.median(rss) / 1024, 1),
+        "psycopg2_loaded": psycopg2_loaded,
+    }
+
+
+def main() -> None:
+    results = {name: measure(extra) for name, extra in VARIANTS.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Сравнение сериализации страницы списка заметок (limit=50):
+ORM объекты -> pydantic модели -> jsonable_encoder -> JSONResponse
+против строк запроса -> RowsJSONResponse (orjson).
+
+Запуск из корня проекта: python benchmarks/bench_list_serialization.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import parse_obj_as  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session, contains_eager  # noqa: E402
+
+from auth.models import User  # noqa: E402
+from db import Base  # noqa: E402
+from note_app import schemas  # noqa: E402
+from note_app.models import Note  # noqa: E402
+from note_app.repositorie import NotesRepository  # noqa: E402
+from utils.responses import RowsJSONResponse  # noqa: E402
+
+LIMIT = 50
+NUMBER = 200
+
+
+def fill(session: Session) -> None:
+    user = User(
+        email="bench@example.com",
+        hashed_password="x",
+        user_name="bench",
+    )
+    session.add(user)
+    session.flush()
+    session.add_all(
+        Note(title=f"Заметка {i}", content="Текст заметки " * 36, user_id=user.id)
+        for i in range(LIMIT)
+    )
+    session.commit()
+
+
+def old_path(session: Session) -> bytes:
+    query = select(Note).join(User).options(contains_eager(Note.user)).limit(LIMIT)
+    res = session.execute(query).scalars().all()
+    notes = [
+        schemas.NoteListUser(user_name=elm.user.user_name, **elm.__dict__)
+        for elm in res
+    ]
+    # Повторная проверка по response_model, как это делает FastAPI
+    content = parse_obj_as(list[schemas.NoteListUser], notes)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_path(session: Session) -> bytes:
+    query = select(*NotesRepository.list_columns, User.user_name).join(User)
+    res = session.execute(query.limit(LIMIT)).all()
+    return RowsJSONResponse(res).body
+
+
+def main() -> None:
+    engine = create_engine("sqlite://")
+    tables = [Base.metadata.tables[name] for name in ("user", "note")]
+    Base.metadata.create_all(engine, tables=tables)
+    with Session(engine) as session:
+        fill(session)
+        results = {}
+        for name, func in (("orm+pydantic", old_path), ("rows+orjson", new_path)):
+            session.expunge_all()
+            seconds = min(timeit.repeat(lambda: func(session), number=NUMBER, repeat=5))
+            results[name] = seconds / NUMBER * 1e6
+            print(f"{name:>14}: {results[name]:8.1f} мкс на запрос")
+        ratio = results["orm+pydantic"] / results["rows+orjson"]
+        print(f"{'ускорение':>14}: {ratio:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Процессорное время проверки ограничения частоты запросов в памяти процесса.
+
+Измеряет RateLimiter.retry_after с MemoryRateLimitBackend для одного ключа,
+для 10 000 и для 200 000 разных ключей (во втором случае корзины
+вытесняются при RATE_LIMIT_MAX_KEYS по умолчанию).
+
+Запуск из корня проекта: python benchmarks/bench_rate_limit.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "app"))
+
+NUMBER = 200000
+REPEAT = 5
+
+
+async def measure(limiter, keys: list[str]) -> float:
+    """Наименьшее процессорное время одной проверки из REPEAT серий, мкс"""
+    timings = []
+    for _ in range(REPEAT):
+        started_at = time.process_time()
+        for i in range(NUMBER):
+            await limiter.retry_after("list", keys[i % len(keys)])
+        timings.append(time.process_time() - started_at)
+    return min(timings) / NUMBER * 1e6
+
+
+async def main() -> None:
+    load_dotenv(ROOT_DIR / ".test.env", override=True)
+    from setings import settings
+    from utils.rate_limit import MemoryRateLimitBackend, RateLimiter
+
+    for keys_count in (1, 10000, 200000):
+        limiter = RateLimiter(
+            MemoryRateLimitBackend(max_size=settings.RATE_LIMIT_MAX_KEYS),
+            limits={"list": settings.RATE_LIMIT_LIST},
+        )
+        keys = [f"user:{i}" for i in range(keys_count)]
+        result = await measure(limiter, keys)
+        print(f"{keys_count:>8} ключей: {result:6.2f} мкс на проверку")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
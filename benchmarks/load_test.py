@@ -0,0 +1,339 @@
+"""
+Нагрузочный тест API заметок.
+
+Для каждого объема данных пересоздает схему тестовой БД, заполняет ее
+пользователями и заметками и выполняет сценарии через httpx напрямую
+в ASGI приложении. Для каждого сценария считаются p50/p95/p99, RPS и
+количество ответов с ошибкой (4xx/5xx), результаты записываются в JSON
+для сравнения между коммитами. При ответах с ошибкой прогон завершается
+с ненулевым кодом.
+
+Запуск из корня проекта (используется БД из .test.env):
+    python benchmarks/load_test.py --sizes 1000,10000
+    python benchmarks/load_test.py --compare benchmarks/results/<old>.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "app"))
+
+WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliett kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor whiskey"
+).split()
+PASSWORD = "string"
+
+# Запрос сценария, возвращает ответ httpx
+Request = Callable[[int], Awaitable[Any]]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(
+    latencies: list[float],
+    elapsed: float,
+    errors: int,
+) -> dict[str, float]:
+    """
+    Перцентили задержки в миллисекундах, количество запросов в секунду
+    и количество ответов с ошибкой
+    """
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(percentiles[49] * 1000, 2),
+        "p95_ms": round(percentiles[94] * 1000, 2),
+        "p99_ms": round(percentiles[98] * 1000, 2),
+    }
+
+
+async def run_scenario(
+    request: Request,
+    requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    """Выполняет requests запросов, не более concurrency одновременно"""
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started_at = time.perf_counter()
+            response = await request(i)
+            latencies.append(time.perf_counter() - started_at)
+            if response.is_error:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started_at, errors)
+
+
+async def clear_caches() -> None:
+    """
+    Очищает кэши заметок и пользователей: после пересоздания схемы id
+    заметок и пользователей повторяются, и записи прошлого прогона устарели
+    """
+    from auth.cache import user_cache
+    from utils.cache import repository_cache
+
+    for cache in (repository_cache, user_cache):
+        if cache is not None:
+            await cache.clear()
+
+
+async def seed(users: int, notes: int) -> dict[str, list[int]]:
+    """Пересоздает схему и заполняет БД, возвращает id заметок по email пользователя"""
+    from fastapi_users.password import PasswordHelper
+    from sqlalchemy import insert, select, text
+
+    from auth.models import User
+    from db import Base, async_engine
+    from note_app.models import Note
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await clear_caches()
+
+    async with async_engine.begin() as conn:
+        hashed_password = PasswordHelper().hash(PASSWORD)
+        await conn.execute(
+            insert(User),
+            [
+                {
+                    "email": f"user_{i}@example.com",
+                    "user_name": f"user_{i}",
+                    "hashed_password": hashed_password,
+                    "is_active": True,
+                    "is_superuser": False,
+                    "is_verified": True,
+                }
+                for i in range(users)
+            ],
+        )
+        user_ids = (await conn.execute(select(User.__table__.c.id))).scalars().all()
+        rows = [
+            {
+                "title": f"note {i}",
+                "content": " ".join(random.choices(WORDS, k=40)),
+                "user_id": user_ids[i % users],
+            }
+            for i in range(notes)
+        ]
+        for i in range(0, notes, 1000):
+            await conn.execute(insert(Note), rows[i : i + 1000])
+
+    async with async_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+        res = await conn.execute(select(Note.id, User.__table__.c.email).join(User))
+        note_ids: dict[str, list[int]] = {}
+        for note_id, email in res:
+            note_ids.setdefault(email, []).append(note_id)
+    return note_ids
+
+
+async def run_size(args: argparse.Namespace, size: int) -> dict[str, Any]:
+    from httpx import AsyncClient, Response
+
+    from main import app
+
+    note_ids = await seed(args.users, size)
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        headers = {}
+        for email in note_ids:
+            response = await client.post(
+                "/auth/jwt/login",
+                data={"username": email, "password": PASSWORD},
+            )
+            response.raise_for_status()
+            token = response.json()["access_token"]
+            headers[email] = {"Authorization": f"Bearer {token}"}
+        emails = list(note_ids)
+        created: list[tuple[str, int]] = []
+
+        async def list_notes(i: int) -> Response:
+            page = random.randint(1, max(size // 25, 1))
+            return await client.get(f"/notes/?limit=25&page={page}")
+
+        async def summary_list(i: int) -> Response:
+            page = random.randint(1, max(size // 25, 1))
+            return await client.get(f"/notes/?limit=25&page={page}&view=summary")
+
+        async def filtered_list(i: int) -> Response:
+            email = random.choice(emails)
+            return await client.get("/notes/user/?limit=25", headers=headers[email])
+
+        async def search(i: int) -> Response:
+            return await client.get(f"/notes/?search={random.choice(WORDS)}")
+
+        async def get_by_id(i: int) -> Response:
+            note_id = random.choice(note_ids[random.choice(emails)])
+            return await client.get(f"/notes/{note_id}/")
+
+        async def create(i: int) -> Response:
+            email = emails[i % len(emails)]
+            response = await client.post(
+                "/notes/",
+                json={"title": f"bench {i}", "content": "bench"},
+                headers=headers[email],
+            )
+            if response.is_success:
+                created.append((email, response.json()["id"]))
+            return response
+
+        async def update(i: int) -> Response:
+            email = emails[i % len(emails)]
+            note_id = random.choice(note_ids[email])
+            return await client.put(
+                f"/notes/{note_id}/",
+                json={"content": f"updated {i}"},
+                headers=headers[email],
+            )
+
+        async def delete(i: int) -> Response:
+            email, note_id = created[i]
+            return await client.delete(f"/notes/{note_id}/", headers=headers[email])
+
+        scenarios: list[tuple[str, Request]] = [
+            ("list", list_notes),
+            ("summary_list", summary_list),
+            ("filtered_list", filtered_list),
+            ("search", search),
+            ("get_by_id", get_by_id),
+            ("create", create),
+            ("update", update),
+            ("delete", delete),
+        ]
+        results = {}
+        for name, request in scenarios:
+            for i in range(args.warmup):
+                if name != "delete":
+                    await request(i)
+            if name == "create":
+                created.clear()
+            # Удаляются только успешно созданные заметки
+            requests = len(created) if name == "delete" else args.requests
+            results[name] = await run_scenario(request, requests, args.concurrency)
+            print(f"{size:>8} {name:>14}: {results[name]}")
+    return results
+
+
+def compare(old: dict[str, Any], new: dict[str, Any]) -> None:
+    """Выводит изменение p95 и RPS относительно предыдущего прогона"""
+    print(f"Сравнение {old['commit']} -> {new['commit']}")
+    for size, scenarios in new["results"].items():
+        for name, result in scenarios.items():
+            previous = old["results"].get(size, {}).get(name)
+            if previous is None:
+                continue
+            p95 = (result["p95_ms"] / previous["p95_ms"] - 1) * 100
+            rps = (result["rps"] / previous["rps"] - 1) * 100
+            print(f"{size:>8} {name:>14}: p95 {p95:+6.1f}%, rps {rps:+6.1f}%")
+
+
+async def main(args: argparse.Namespace) -> None:
+    load_dotenv(ROOT_DIR / args.env_file, override=True)
+    # Все запросы выполняются от нескольких пользователей с одного адреса,
+    # поэтому ограничение частоты запросов отключается
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    from setings import settings
+
+    # Схема БД пересоздается, поэтому запуск разрешен только на тестовой БД
+    if settings.MODE != "TEST":
+        raise SystemExit("Нагрузочный тест запускается только с MODE=TEST")
+
+    random.seed(args.seed)
+    report: dict[str, Any] = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": {
+            "users": args.users,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        report["results"][str(size)] = await run_size(args, size)
+
+    from db import Base, async_engine
+
+    # Тесты создают схему сами и ожидают пустую БД
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+    output = (
+        args.output or ROOT_DIR / "benchmarks" / "results" / f"{report['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Результаты записаны в {output}")
+    if args.compare is not None:
+        compare(json.loads(args.compare.read_text()), report)
+    # Задержки сценариев с ошибками не сравнимы с успешными прогонами
+    failed = [
+        f"{size} {name}: {result['errors']}"
+        for size, scenarios in report["results"].items()
+        for name, result in scenarios.items()
+        if result["errors"]
+    ]
+    if failed:
+        raise SystemExit("Ответы с ошибкой в сценариях:\n" + "\n".join(failed))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API заметок")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[1000, 10000],
+        help="Количество заметок, через запятую",
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env-file", default=".test.env")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,5 +1,8 @@
 from httpx import AsyncClient, Client
+from sqlalchemy import Update, event
 
+from auth.models import User
+from tests.conftest import async_session_maker, engine_test
 from tests.test_auth.conftest import get_user_from_database
 
 
@@ -17,6 +20,9 @@ async def test_register_ac(async_client: AsyncClient):
         "is_superuser": False,
         "is_verified": False,
         "user_name": "user_name",
+        "note_count": 0,
+        "total_content_bytes": 0,
+        "last_updated_at": None,
     }
 
     response = await async_client.post("/auth/register", json=data_user)
@@ -79,3 +85,51 @@ async def test_logout_unauthorized_user(async_client: AsyncClient):
     response = await async_client.post("/auth/jwt/logout")
     assert response.status_code == 401
     assert response.json()["detail"] == "Unauthorized"
+
+
+async def test_current_user_from_cache(async_client: AsyncClient):
+    data_user = {
+        "username": "user@example.com",
+        "password": "string",
+    }
+    response = await async_client.post("/auth/jwt/login", data=data_user)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = await async_client.get("/notes/user/", headers=headers)
+    assert response.status_code == 200
+
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+    try:
+        response = await async_client.get("/notes/user/", headers=headers)
+    finally:
+        event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+    assert response.status_code == 200
+    # Пользователь не загружается из БД, читаются только счетчики его заметок
+    assert not any("hashed_password" in statement for statement in statements)
+
+
+async def test_update_user_invalidates_cache(async_client: AsyncClient):
+    data_user = {
+        "username": "user@example.com",
+        "password": "string",
+    }
+    response = await async_client.post("/auth/jwt/login", data=data_user)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = await async_client.get("/notes/user/", headers=headers)
+    assert response.status_code == 200
+
+    async with async_session_maker() as session:
+        query = Update(User).where(User.id == 3).values(is_superuser=True)
+        await session.execute(query)
+        await session.commit()
+    response = await async_client.patch(
+        "/users/3", headers=headers, json={"is_active": False}
+    )
+    assert response.status_code == 200
+
+    response = await async_client.get("/notes/user/", headers=headers)
+    assert response.status_code == 401
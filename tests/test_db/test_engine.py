@@ -0,0 +1,75 @@
+import pytest
+
+import main
+import server
+from db import async_engine
+from main import app
+from setings import settings
+
+
+def test_pool_limits():
+    limited = settings.copy(
+        update={
+            "WEB_CONCURRENCY": 4,
+            "DB_MAX_CONNECTIONS": 20,
+            "DB_POOL_SIZE": 10,
+            "DB_MAX_OVERFLOW": 10,
+        }
+    )
+    assert limited.DB_POOL_LIMITS == (5, 0)
+
+    limited = settings.copy(
+        update={
+            "WEB_CONCURRENCY": 2,
+            "DB_MAX_CONNECTIONS": 20,
+            "DB_POOL_SIZE": 5,
+            "DB_MAX_OVERFLOW": 10,
+        }
+    )
+    assert limited.DB_POOL_LIMITS == (5, 5)
+
+    unlimited = settings.copy(update={"DB_MAX_CONNECTIONS": 0})
+    assert unlimited.DB_POOL_LIMITS == (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+
+
+async def test_lifespan_warms_up_and_disposes_pool(monkeypatch):
+    monkeypatch.setattr(
+        main, "settings", settings.copy(update={"DB_POOL_WARMUP": True})
+    )
+    async with app.router.lifespan_context(app):
+        assert async_engine.pool.checkedin() == settings.DB_POOL_SIZE
+    assert async_engine.pool.checkedin() == 0
+
+
+def test_worker_settings_disable_process_state(monkeypatch):
+    monkeypatch.setattr(
+        server, "settings", settings.copy(update={"WEB_CONCURRENCY": 1})
+    )
+    assert server.check_worker_settings() == {}
+
+    multi_worker = {
+        "WEB_CONCURRENCY": 4,
+        "RATE_LIMIT_BACKEND": "redis",
+        "CACHE_BACKEND": "memory",
+        "AUTH_CACHE_TTL": 60,
+        "METRICS_ENABLED": True,
+        "DB_QUERY_METRICS": False,
+    }
+    monkeypatch.setattr(server, "settings", settings.copy(update=multi_worker))
+    assert server.check_worker_settings() == {
+        "CACHE_BACKEND": "none",
+        "AUTH_CACHE_TTL": "0",
+        "METRICS_ENABLED": "false",
+    }
+
+    # Ограничение частоты запросов и отложенная запись в памяти каждого
+    # воркера не запускаются
+    for name, value in (
+        ("NOTE_WRITE_BEHIND_MS", 500),
+        ("RATE_LIMIT_BACKEND", "memory"),
+    ):
+        monkeypatch.setattr(
+            server, "settings", settings.copy(update={**multi_worker, name: value})
+        )
+        with pytest.raises(SystemExit):
+            server.check_worker_settings()
@@ -0,0 +1,93 @@
+from typing import Any, Callable
+
+import pytest
+from sqlalchemy import Select, text
+from sqlalchemy.dialects import postgresql
+
+from note_app import filters
+from note_app.repositorie import NotesRepository
+from tests.conftest import engine_test, async_session_maker
+
+
+async def explain(query: Select, bitmapscan: bool = False) -> str:
+    """
+    Возвращает план запроса.
+    Последовательное и bitmap сканирование отключаются, чтобы на малом объеме
+    тестовых данных планировщик показал, может ли запрос быть выполнен по индексу
+    """
+    compiled = query.compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={"literal_binds": True},
+    )
+    async with engine_test.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+        if not bitmapscan:
+            await conn.execute(text("SET enable_bitmapscan = off"))
+        result = await conn.execute(text(f"EXPLAIN {compiled}"))
+        return "\n".join(row[0] for row in result)
+
+
+def list_query(
+    repository: NotesRepository,
+    build_query: Callable[[], Select],
+    filter_note: filters.PlannedFilter,
+    params: dict[str, Any] | None = None,
+) -> Select:
+    """Запрос страницы списка, как его выполняет репозиторий"""
+    query = repository.elements_query(
+        name="explain",
+        build_query=build_query,
+        filter_elm=filter_note,
+    )
+    params = {
+        **repository.elements_params(filter_note, limit=25, page=2),
+        **(params or {}),
+    }
+    return query.params(**params)
+
+
+@pytest.mark.parametrize("summary", [False, True])
+async def test_list_note_user_uses_index(summary):
+    repository = NotesRepository(async_session_maker())
+    filter_note = filters.NoteFilterByUserId(user_id=1)
+    query = list_query(
+        repository,
+        lambda: repository.note_rows_query(summary),
+        filter_note,
+    )
+    plan = await explain(query)
+    assert "ix_note_user_id_updated_at" in plan
+    assert "Sort" not in plan
+
+
+@pytest.mark.parametrize("summary", [False, True])
+async def test_list_note_uses_index(summary):
+    repository = NotesRepository(async_session_maker())
+    filter_note = filters.NoteFilter(title=None, search=None, order_by=None)
+    params = repository.notes_with_users_order(filter_note)
+    assert filter_note.order_by == filters.NOTE_DEFAULT_ORDER_BY
+    query = list_query(
+        repository,
+        lambda: repository.notes_with_users_query(summary),
+        filter_note,
+        params,
+    )
+    plan = await explain(query)
+    assert "ix_note_created_at_title" in plan
+    assert "Sort" not in plan
+
+
+async def test_search_note_uses_trgm_index():
+    repository = NotesRepository(async_session_maker())
+    filter_note = filters.NoteFilter(title=None, search="title_9", order_by=None)
+    params = repository.notes_with_users_order(filter_note)
+    query = list_query(
+        repository,
+        lambda: repository.notes_with_users_query(by_relevance=True),
+        filter_note,
+        params,
+    )
+    plan = await explain(query, bitmapscan=True)
+    assert "ix_note_title_trgm" in plan
+    assert "ix_note_content_trgm" in plan
+    assert "Seq Scan" not in plan
@@ -0,0 +1,101 @@
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+from starlette.responses import Response
+
+import db
+from db import ReplicaRouter
+from setings import settings
+
+
+def make_request(method: str = "GET", cookie: str | None = None) -> Request:
+    headers = []
+    if cookie is not None:
+        headers.append((b"cookie", cookie.encode()))
+    return Request({"type": "http", "method": method, "headers": headers})
+
+
+def pin_cookie(replica_router: ReplicaRouter) -> str:
+    """Cookie привязки к основной БД из ответа на запрос записи"""
+    response = Response()
+    replica_router.pin(response)
+    return response.headers["set-cookie"].split(";")[0]
+
+
+async def test_round_robin():
+    engines = [create_async_engine(settings.ASYNC_SQL_URL) for _ in range(2)]
+    replica_router = ReplicaRouter(engines)
+    request = make_request()
+    assert [replica_router.get_engine(request) for _ in range(3)] == [
+        engines[0],
+        engines[1],
+        engines[0],
+    ]
+
+
+async def test_least_connections():
+    engines = [create_async_engine(settings.ASYNC_SQL_URL) for _ in range(2)]
+    replica_router = ReplicaRouter(engines, strategy="least_connections")
+    try:
+        async with engines[0].connect():
+            assert replica_router.get_engine(make_request()) is engines[1]
+        async with engines[1].connect():
+            assert replica_router.get_engine(make_request()) is engines[0]
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+
+async def test_pin_after_write(monkeypatch):
+    replica_router = ReplicaRouter([create_async_engine(settings.ASYNC_SQL_URL)])
+    cookie = pin_cookie(replica_router)
+    assert replica_router.get_engine(make_request(cookie=cookie)) is None
+    assert replica_router.get_engine(make_request()) is not None
+
+    # Привязка действует в любом воркере с тем же секретным ключом,
+    # подделанная cookie не учитывается
+    other_worker = ReplicaRouter(replica_router.engines)
+    assert other_worker.get_engine(make_request(cookie=cookie)) is None
+    name, _, value = cookie.partition("=")
+    expires_at = str(float(value.split(":")[0]) + 3600)
+    forged = f"{name}={expires_at}:{value.split(':')[1]}"
+    assert replica_router.get_engine(make_request(cookie=forged)) is not None
+
+    monkeypatch.setattr(db.time, "time", lambda: float("inf"))
+    assert replica_router.get_engine(make_request(cookie=cookie)) is not None
+
+
+async def test_reads_routed_to_replica(
+    monkeypatch,
+    async_client: AsyncClient,
+    jwt_token: str,
+):
+    replica_engine = create_async_engine(settings.ASYNC_SQL_URL, poolclass=NullPool)
+    monkeypatch.setattr(db, "replica_router", ReplicaRouter([replica_engine]))
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(replica_engine.sync_engine, "before_cursor_execute", on_execute)
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+
+    response = await async_client.get("/notes/1000/", headers=headers)
+    assert response.status_code == 404
+    assert len(statements) == 1
+    assert "FROM note" in statements[0]
+
+    # Запрос записи передает клиенту cookie привязки к основной БД
+    response = await async_client.request(
+        "DELETE", "/notes/bulk", headers=headers, json=[1000]
+    )
+    assert response.status_code == 200
+    assert ReplicaRouter.cookie_name in response.cookies
+    try:
+        response = await async_client.get("/notes/1000/", headers=headers)
+        assert response.status_code == 404
+        assert len(statements) == 1
+    finally:
+        async_client.cookies.clear()
@@ -0,0 +1,145 @@
+import datetime
+import fnmatch
+
+from note_app.models import Note
+from utils import cache
+from utils.cache import MemoryCache, RedisCache, dump_model, load_model
+
+
+class FakeRedis:
+    """Локальная замена клиента redis.asyncio.Redis"""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.ttl: dict[str, int] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.data[key] = value
+        if ex is not None:
+            self.ttl[key] = ex
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def expire(self, key: str, seconds: int) -> None:
+        self.ttl[key] = seconds
+
+    async def scan_iter(self, match: str):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    async def eval(self, script: str, numkeys: int, *args) -> int:
+        # Выполняет SET_IF_GENERATION
+        key, generation_key, value, ex, generation = args
+        if self.data.get(generation_key, "0") == str(generation):
+            await self.set(key, value, ex=ex)
+        return 0
+
+
+async def test_memory_cache_lru():
+    memory_cache = MemoryCache(max_size=2)
+    await memory_cache.set("a", {"id": 1})
+    await memory_cache.set("b", {"id": 2})
+    assert await memory_cache.get("a") == {"id": 1}
+
+    await memory_cache.set("c", {"id": 3})
+    assert await memory_cache.get("b") is None
+    assert await memory_cache.get("a") == {"id": 1}
+    assert await memory_cache.get("c") == {"id": 3}
+    assert memory_cache.stats() == {"hits": 3, "misses": 1}
+
+
+async def test_memory_cache_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    memory_cache = MemoryCache(ttl=10)
+    await memory_cache.set("a", {"id": 1})
+    assert await memory_cache.get("a") == {"id": 1}
+
+    now += 10
+    assert await memory_cache.get("a") is None
+    assert memory_cache.stats() == {"hits": 1, "misses": 1}
+
+
+async def test_memory_cache_generation():
+    memory_cache = MemoryCache(max_size=2)
+    generation = await memory_cache.generation("a")
+    # Запись удалена после чтения из БД, устаревшее значение не сохраняется
+    await memory_cache.delete("a")
+    await memory_cache.set("a", {"id": 1}, generation=generation)
+    assert await memory_cache.get("a") is None
+
+    generation = await memory_cache.generation("a")
+    await memory_cache.set("a", {"id": 2}, generation=generation)
+    assert await memory_cache.get("a") == {"id": 2}
+
+    # Поколение вытесненной записи не возвращается к прежнему значению
+    generation = await memory_cache.generation("b")
+    await memory_cache.delete("b")
+    await memory_cache.delete("c")
+    await memory_cache.delete("d")
+    assert "b" not in memory_cache._generations
+    await memory_cache.set("b", {"id": 3}, generation=generation)
+    assert await memory_cache.get("b") is None
+
+    await memory_cache.clear()
+    assert await memory_cache.get("a") is None
+
+
+async def test_redis_cache():
+    client = FakeRedis()
+    redis_cache = RedisCache(client, ttl=30)
+    assert await redis_cache.get("note:1") is None
+
+    await redis_cache.set("note:1", {"id": 1, "title": "title"})
+    assert client.ttl["notes-api:note:1"] == 30
+    assert await redis_cache.get("note:1") == {"id": 1, "title": "title"}
+
+    await redis_cache.set("note:1", {"id": 1}, ttl=5.5)
+    assert client.ttl["notes-api:note:1"] == 5
+
+    generation = await redis_cache.generation("note:1")
+    await redis_cache.delete("note:1")
+    assert await redis_cache.get("note:1") is None
+    assert client.ttl["notes-api:generation:note:1"] == 30
+
+    await redis_cache.set("note:1", {"id": 1}, generation=generation)
+    assert await redis_cache.get("note:1") is None
+    generation = await redis_cache.generation("note:1")
+    await redis_cache.set("note:1", {"id": 1}, generation=generation)
+    assert await redis_cache.get("note:1") == {"id": 1}
+    assert redis_cache.stats() == {"hits": 2, "misses": 3}
+
+    await redis_cache.clear()
+    assert await redis_cache.get("note:1") is None
+    assert await redis_cache.generation("note:1") == generation
+
+
+async def test_dump_and_load_model():
+    created_at = datetime.datetime(2023, 7, 15, 14, 56, 59)
+    note = Note(
+        id=1,
+        user_id=2,
+        title="title",
+        content=None,
+        created_at=created_at,
+        updated_at=created_at,
+    )
+    data = dump_model(note)
+    assert data["created_at"] == "2023-07-15T14:56:59"
+
+    redis_cache = RedisCache(FakeRedis())
+    await redis_cache.set("note:1", data)
+    note_from_cache = load_model(Note, await redis_cache.get("note:1"))
+    assert note_from_cache.id == 1
+    assert note_from_cache.user_id == 2
+    assert note_from_cache.content is None
+    assert note_from_cache.created_at == created_at
@@ -0,0 +1,79 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import AsyncClient
+
+from utils.compression import CompressionMiddleware, choose_encoding
+
+BODY = "заметка " * 500
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+
+@app.get("/large")
+async def large() -> PlainTextResponse:
+    return PlainTextResponse(BODY)
+
+
+@app.get("/small")
+async def small() -> PlainTextResponse:
+    return PlainTextResponse("заметка")
+
+
+@app.get("/encoded")
+async def encoded() -> PlainTextResponse:
+    return PlainTextResponse(BODY, headers={"Content-Encoding": "identity"})
+
+
+@app.get("/stream")
+async def stream() -> StreamingResponse:
+    async def chunks():
+        for _ in range(10):
+            yield BODY
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def test_choose_encoding():
+    encodings = ("br", "gzip")
+    assert choose_encoding("gzip, deflate, br", encodings) == "br"
+    assert choose_encoding("gzip, br;q=0.5", encodings) == "gzip"
+    assert choose_encoding("deflate", encodings) is None
+    assert choose_encoding("*", encodings) == "br"
+    assert choose_encoding("*, br;q=0", encodings) == "gzip"
+    assert choose_encoding("gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("", encodings) is None
+
+
+async def test_compression():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        headers = {"Accept-Encoding": "gzip"}
+        response = await client.get("/large", headers=headers)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert int(response.headers["Content-Length"]) < len(BODY.encode()) / 10
+        assert response.text == BODY
+
+        response = await client.get("/small", headers=headers)
+        assert "Content-Encoding" not in response.headers
+        assert response.text == "заметка"
+
+        response = await client.get("/encoded", headers=headers)
+        assert response.headers["Content-Encoding"] == "identity"
+        assert response.text == BODY
+
+        response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert response.text == BODY
+
+
+async def test_compression_stream():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        headers = {"Accept-Encoding": "gzip"}
+        async with client.stream("GET", "/stream", headers=headers) as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert "Content-Length" not in response.headers
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        assert gzip.decompress(body).decode() == BODY * 10
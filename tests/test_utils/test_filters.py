@@ -0,0 +1,46 @@
+import pytest
+from pydantic import BaseModel
+
+from note_app.filters import NoteFilter, NoteFilterByUserId, UserFilter
+from utils.filters import InvalidSortError, parse_filter
+
+
+def test_filter_plan_reused_for_same_shape():
+    first = NoteFilter(title="a", user=UserFilter(user_name__like="b"), order_by=None)
+    second = NoteFilter(title="c", user=UserFilter(user_name__like="d"), order_by=None)
+    assert first.shape == second.shape
+    assert first.plan is second.plan
+    assert first.filter_params() == {
+        "filter_title": "a",
+        "filter_user__user_name__like": "%b%",
+    }
+    assert second.filter_params()["filter_title"] == "c"
+
+    sorted_filter = NoteFilter(title="a", order_by=["-title"])
+    assert sorted_filter.shape != first.shape
+
+
+def test_filter_isnull_is_part_of_shape():
+    class NoteFilterIsNull(NoteFilterByUserId):
+        content__isnull: bool | None
+
+    with_content = NoteFilterIsNull(content__isnull=False)
+    without_content = NoteFilterIsNull(content__isnull=True)
+    assert with_content.shape != without_content.shape
+    assert with_content.filter_params() == {}
+
+
+def test_parse_filter_sort_fields():
+    class Values(BaseModel):
+        order_by: list[str]
+
+    note_filter = parse_filter(NoteFilter, Values(order_by=["-title"]))
+    assert note_filter.ordering_fields == ("-title",)
+
+    # Колонки, которых нет в строках списков, разрешены
+    for field_name in ("user_id", "-content"):
+        note_filter = parse_filter(NoteFilter, Values(order_by=[field_name]))
+        assert note_filter.ordering_fields == (field_name,)
+
+    with pytest.raises(InvalidSortError):
+        parse_filter(NoteFilter, Values(order_by=["metadata"]))
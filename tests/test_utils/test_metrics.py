@@ -0,0 +1,84 @@
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from setings import settings
+from utils import metrics
+from tests.conftest import engine_test
+from utils.metrics import (
+    TimedAsyncAdaptedQueuePool,
+    format_labels,
+    render_metrics,
+    statement_cache_metrics,
+)
+
+
+def test_format_labels():
+    labels = {"route": "/notes/{note_id}/", "detail": 'a "b"\n'}
+    assert format_labels(labels) == (
+        '{route="/notes/{note_id}/",detail="a \\"b\\"\\n"}'
+    )
+
+
+async def test_pool_checkout_time():
+    engine = create_async_engine(
+        settings.ASYNC_SQL_URL,
+        poolclass=TimedAsyncAdaptedQueuePool,
+    )
+    count = metrics.pool_checkout_seconds.count
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+    assert metrics.pool_checkout_seconds.count == count + 1
+
+
+async def test_metrics(async_client: AsyncClient):
+    response = await async_client.get("/notes/1000/")
+    assert response.status_code == 404
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    labels = 'method="GET",route="/notes/{note_id}/"'
+    assert any(
+        line.startswith(f'http_requests_total{{{labels},status="404"}} ')
+        for line in lines
+    )
+    assert any(
+        line.startswith(f"http_request_duration_seconds_count{{{labels}}} ")
+        for line in lines
+    )
+    # Запрос к /metrics еще выполняется
+    assert 'http_requests_in_progress{method="GET"} 1' in lines
+    assert 'cache_requests_total{cache="notes",result="miss"}' in response.text
+    assert "db_pool_checkout_seconds_count" in response.text
+
+
+async def test_statement_cache_metrics(async_client: AsyncClient):
+    statement_cache_metrics.instrument(engine_test.sync_engine)
+    try:
+        for _ in range(2):
+            response = await async_client.get("/notes/1000/")
+            assert response.status_code == 404
+    finally:
+        statement_cache_metrics.remove(engine_test.sync_engine)
+    assert statement_cache_metrics.requests["hit"] >= 1
+
+    content = render_metrics(
+        pool=engine_test.pool,
+        caches={},
+        statement_cache_size=statement_cache_metrics.cache_size(
+            engine_test.sync_engine
+        ),
+    )
+    assert 'db_statement_cache_requests_total{result="hit"}' in content
+    assert "db_statement_cache_hit_ratio " in content
+    assert "db_statement_cache_entries " in content
+
+    # Без кэша скомпилированных запросов размер не передается
+    assert statement_cache_metrics.cache_size(object()) is None
+    content = render_metrics(pool=engine_test.pool, caches={})
+    assert "db_statement_cache_entries" not in content
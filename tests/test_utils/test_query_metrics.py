@@ -0,0 +1,43 @@
+import logging
+
+from httpx import AsyncClient
+
+from main import app
+from utils.metrics import Histogram
+from utils.query_metrics import QueryMetrics, QueryRouteMiddleware
+from tests.conftest import engine_test
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.to_dict() == {
+        "buckets": {"1": 2, "10": 3, "+Inf": 4},
+        "count": 4,
+        "sum": 56.5,
+    }
+
+
+async def test_query_metrics_by_route(caplog):
+    query_metrics = QueryMetrics(slow_query_ms=0)
+    query_metrics.instrument(engine_test.sync_engine)
+    try:
+        async with AsyncClient(
+            app=QueryRouteMiddleware(app), base_url="http://test"
+        ) as async_client:
+            with caplog.at_level(logging.WARNING, logger="notes_api.sql"):
+                response = await async_client.get("/notes/1000/")
+    finally:
+        query_metrics.remove(engine_test.sync_engine)
+    assert response.status_code == 404
+
+    stats = query_metrics.stats()
+    assert [(elm["route"], elm["operation"]) for elm in stats] == [
+        ("GET /notes/{note_id}/", "SELECT")
+    ]
+    assert stats[0]["latency_ms"]["count"] == 1
+    assert stats[0]["rows"] == 0
+
+    assert len(caplog.records) == 1
+    assert caplog.records[0].route == "GET /notes/{note_id}/"
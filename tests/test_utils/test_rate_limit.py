@@ -0,0 +1,44 @@
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import MemoryRateLimitBackend, RateLimiter, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit("60/minute") == (1, 60)
+    assert parse_limit("10/second") == (10, 10)
+    with pytest.raises(ValueError):
+        parse_limit("10/day")
+    with pytest.raises(ValueError):
+        parse_limit("0/minute")
+
+
+async def test_memory_token_bucket(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now)
+    backend = MemoryRateLimitBackend(max_size=2)
+    for _ in range(3):
+        assert await backend.acquire("a", rate=1, capacity=3) == 0
+    assert await backend.acquire("a", rate=1, capacity=3) == 1
+
+    # Корзина пополняется со скоростью rate токенов в секунду
+    now += 1.5
+    assert await backend.acquire("a", rate=1, capacity=3) == 0
+    assert await backend.acquire("a", rate=1, capacity=3) == pytest.approx(0.5)
+
+    # Вытесняется давно не использованная корзина
+    await backend.acquire("b", rate=1, capacity=3)
+    await backend.acquire("a", rate=1, capacity=3)
+    await backend.acquire("c", rate=1, capacity=3)
+    assert list(backend._buckets) == ["a", "c"]
+
+
+async def test_rate_limiter_groups():
+    limiter = RateLimiter(
+        MemoryRateLimitBackend(),
+        limits={"list": "2/minute", "write": "1/minute"},
+    )
+    assert await limiter.retry_after("write", "user:1") == 0
+    assert await limiter.retry_after("write", "user:1") == pytest.approx(60)
+    assert await limiter.retry_after("write", "user:2") == 0
+    assert await limiter.retry_after("list", "user:1") == 0
@@ -0,0 +1,34 @@
+import datetime
+
+import orjson
+
+from note_app.models import Note
+from utils.pagination import Page
+from utils.responses import RowsJSONResponse
+
+
+async def test_rows_response_page_of_models():
+    created_at = datetime.datetime(2023, 7, 15, 14, 56, 59)
+    note = Note(
+        id=1,
+        user_id=2,
+        title="title",
+        content=None,
+        created_at=created_at,
+        updated_at=created_at,
+    )
+    response = RowsJSONResponse(Page(items=[note], total=1, next=None))
+    assert orjson.loads(response.body) == {
+        "items": [
+            {
+                "id": 1,
+                "user_id": 2,
+                "title": "title",
+                "content": None,
+                "created_at": "2023-07-15T14:56:59",
+                "updated_at": "2023-07-15T14:56:59",
+            }
+        ],
+        "total": 1,
+        "next": None,
+    }
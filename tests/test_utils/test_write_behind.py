@@ -0,0 +1,112 @@
+import asyncio
+
+from utils.write_behind import WriteBehindQueue
+
+
+async def test_write_behind_queue_merges_updates():
+    writes: list[tuple] = []
+
+    async def write(scope, updates: dict) -> None:
+        writes.append((scope, updates))
+
+    write_queue = WriteBehindQueue(write, delay=0.01)
+    await write_queue.put(1, {"title": "a"}, scope="user_1")
+    await write_queue.put(1, {"content": "b"}, scope="user_1")
+    await write_queue.put(1, {"title": "c"}, scope="user_1")
+    await write_queue.put(2, {"title": "d"}, scope="user_1")
+    await write_queue.put(3, {"title": "e"}, scope="user_2")
+    assert writes == []
+
+    await asyncio.sleep(0.05)
+    assert writes == [
+        ("user_1", {1: {"title": "c", "content": "b"}, 2: {"title": "d"}}),
+        ("user_2", {3: {"title": "e"}}),
+    ]
+
+    # Изменения объекта с другой областью записи не объединяются
+    await write_queue.put(1, {"title": "f"}, scope="user_1")
+    await write_queue.put(1, {"content": "g"}, scope="admin")
+    assert writes[-1] == ("user_1", {1: {"title": "f"}})
+    await write_queue.close()
+    assert writes[-1] == ("admin", {1: {"content": "g"}})
+
+
+async def test_write_behind_queue_flush_and_discard():
+    writes: list[dict] = []
+
+    async def write(scope, updates: dict) -> None:
+        writes.append(updates)
+
+    write_queue = WriteBehindQueue(write, delay=60, max_pending=3)
+    await write_queue.put(1, {"title": "a"})
+    await write_queue.put(2, {"title": "b"})
+    await write_queue.flush(2, 5)
+    assert writes == [{2: {"title": "b"}}]
+
+    write_queue.discard(1)
+    await write_queue.flush(1)
+    assert len(writes) == 1
+
+    # При max_pending изменения записываются без ожидания
+    for note_id in (1, 2, 3):
+        await write_queue.put(note_id, {"title": "c"})
+    assert len(writes) == 2
+    assert not write_queue.pending
+
+    await write_queue.put(4, {"title": "d"})
+    await write_queue.close()
+    assert writes[-1] == {4: {"title": "d"}}
+
+
+async def test_write_behind_queue_drops_only_permanent_failures(caplog):
+    writes: list[dict] = []
+
+    async def write(scope, updates: dict) -> None:
+        if any(len(values["title"]) > 60 for values in updates.values()):
+            raise ValueError("value too long")
+        writes.append(updates)
+
+    write_queue = WriteBehindQueue(write, delay=60, permanent_errors=(ValueError,))
+    await write_queue.put(1, {"title": "a" * 61})
+    await write_queue.put(2, {"title": "b"})
+    await write_queue.put(3, {"title": "c"})
+    await write_queue.close()
+    assert writes == [{2: {"title": "b"}}, {3: {"title": "c"}}]
+    assert not write_queue.pending
+    assert "Изменения объекта 1 отброшены" in caplog.text
+
+
+async def test_write_behind_queue_retries_failed_writes(caplog):
+    writes: list[dict] = []
+    failures = 2
+
+    async def write(scope, updates: dict) -> None:
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise ConnectionError("connection lost")
+        writes.append(updates)
+
+    write_queue = WriteBehindQueue(write, delay=0.01, permanent_errors=(ValueError,))
+    await write_queue.put(1, {"title": "a"})
+    await write_queue.flush()
+    # Изменения возвращены в очередь, более новые значения сохраняются
+    assert write_queue.attempts == {1: 1}
+    await write_queue.put(1, {"content": "b"})
+    await write_queue.flush(1)
+    assert write_queue.attempts == {1: 2}
+    assert writes == []
+
+    await asyncio.sleep(0.1)
+    assert writes == [{1: {"title": "a", "content": "b"}}]
+    assert not write_queue.pending
+    assert not write_queue.attempts
+
+    # После max_retries неудачных попыток изменения отбрасываются
+    failures = 10
+    write_queue.max_retries = 2
+    await write_queue.put(2, {"title": "c"})
+    await write_queue.close()
+    assert not write_queue.pending
+    assert "Изменения объекта 2 отброшены после 2 попыток" in caplog.text
+    assert len(writes) == 1
@@ -1,8 +1,32 @@
+import csv
+import io
+import json
+
 from httpx import AsyncClient
-from sqlalchemy import Delete, Insert, Select
+from sqlalchemy import Delete, Insert, Select, event, func, select, text
+from sqlalchemy.engine.interfaces import CacheStats
 
+from main import app
 from note_app.models import Note
-from tests.conftest import async_session_maker
+from note_app.repositorie import NotesRepository
+from note_app.write_behind import get_note_write_queue
+from tests.conftest import async_session_maker, engine_test
+from utils import rate_limit
+from utils.rate_limit import MemoryRateLimitBackend, RateLimiter
+from utils.write_behind import WriteBehindQueue
+
+
+async def assert_cursor_pages(async_client: AsyncClient, url: str) -> None:
+    """Вторая страница по курсору совпадает со второй страницей по номеру"""
+    response = await async_client.get(url)
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+    by_cursor = await async_client.get(f"{url}&cursor={cursor}")
+    assert by_cursor.status_code == 200
+    by_page = await async_client.get(f"{url}&page=2")
+    assert [note["id"] for note in by_cursor.json()] == [
+        note["id"] for note in by_page.json()
+    ]
 
 
 class TestCreateNote:
@@ -69,6 +93,14 @@ class TestCreateNote:
         assert response.status_code == 422
         assert "field required" in str(response.content)
 
+        data_note_3 = {"title": "t" * 61, "content": "content"}
+        response = await async_client.post("/notes/", json=data_note_3, headers=headers)
+        assert response.status_code == 422
+        response = await async_client.put(
+            "/notes/1/", json={"title": "t" * 61}, headers=headers
+        )
+        assert response.status_code == 422
+
 
 class TestDeleteNote:
     async def test_delete_note(
@@ -155,6 +187,27 @@ class TestGetNote:
         assert "created_at" in note
         assert "updated_at" in note
 
+    async def test_get_note_by_id_from_cache(
+        self,
+        async_client: AsyncClient,
+    ):
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        response = await async_client.get("/notes/2/")
+        assert response.status_code == 200
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response_from_cache = await async_client.get("/notes/2/")
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response_from_cache.status_code == 200
+        assert response_from_cache.json() == response.json()
+        assert statements == []
+
     async def test_get_non_existent_note_by_id(
         self,
         async_client: AsyncClient,
@@ -199,6 +252,50 @@ class TestGetNote:
         assert response.status_code == 200
         assert len(response.json()) == 10
 
+    async def test_get_notes_cursor_pagination(
+        self,
+        async_client: AsyncClient,
+    ):
+        response = await async_client.get("/notes/?limit=20&page=2")
+        notes_by_page = response.json()
+
+        response = await async_client.get("/notes/?limit=20")
+        assert response.status_code == 200
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = await async_client.get(f"/notes/?limit=20&cursor={cursor}")
+        assert response.status_code == 200
+        assert response.json() == notes_by_page
+        assert "X-Next-Cursor" not in response.headers
+
+        response = await async_client.get(
+            "/notes/?limit=5&order_by=-title&user=t_user_2"
+        )
+        first_page = response.json()
+        cursor = response.headers["X-Next-Cursor"]
+        response = await async_client.get(
+            f"/notes/?limit=5&order_by=-title&user=t_user_2&cursor={cursor}"
+        )
+        second_page = response.json()
+        assert len(second_page) == 5
+        assert first_page[-1]["title"] > second_page[0]["title"]
+        assert all(note["user_name"] == "test_user_2" for note in second_page)
+
+    async def test_get_notes_not_valid_cursor(
+        self,
+        async_client: AsyncClient,
+    ):
+        response = await async_client.get("/notes/?limit=5")
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = await async_client.get(f"/notes/?order_by=-title&cursor={cursor}")
+        assert response.status_code == 422
+        assert response.json()["detail"] == "Передан не корректный курсор пагинации"
+
+        response = await async_client.get("/notes/?cursor=not-a-cursor")
+        assert response.status_code == 422
+        assert response.json()["detail"] == "Передан не корректный курсор пагинации"
+
     async def test_get_notes_sorted(
         self,
         async_client: AsyncClient,
@@ -221,6 +318,16 @@ class TestGetNote:
             response.json()["detail"] == "Переданы не корректные данные для сортировки"
         )
 
+        response = await async_client.get("/notes/?order_by=metadata")
+        assert response.status_code == 422
+        assert (
+            response.json()["detail"] == "Переданы не корректные данные для сортировки"
+        )
+
+        # user_id нет в строках списка, его значение для курсора
+        # выбирается из строки курсора
+        await assert_cursor_pages(async_client, "/notes/?limit=5&order_by=-user_id")
+
     async def test_get_notes_search(
         self,
         async_client: AsyncClient,
@@ -235,6 +342,33 @@ class TestGetNote:
         assert len(response.json()) == 1
         assert response.json()[0]["content"] == "test_content_12"
 
+    async def test_get_notes_search_relevance(
+        self,
+        async_client: AsyncClient,
+    ):
+        test_notes = [
+            {"title": "aaa", "content": "irrelevance", "user_id": 1},
+            {"title": "zzz relevance", "content": "content", "user_id": 1},
+        ]
+        async with async_session_maker() as session:
+            query = Insert(Note).values(test_notes).returning(Note.id)
+            result = await session.execute(query)
+            await session.commit()
+        notes_id = result.scalars().all()
+
+        response = await async_client.get("/notes/?search=relevance")
+        assert response.status_code == 200
+        assert [note["title"] for note in response.json()] == ["zzz relevance", "aaa"]
+        assert "X-Next-Cursor" not in response.headers
+
+        response = await async_client.get("/notes/?search=relevance&order_by=+title")
+        assert response.status_code == 200
+        assert [note["title"] for note in response.json()] == ["aaa", "zzz relevance"]
+
+        async with async_session_maker() as session:
+            await session.execute(Delete(Note).where(Note.id.in_(notes_id)))
+            await session.commit()
+
     async def test_get_notes_filters(
         self,
         async_client: AsyncClient,
@@ -249,6 +383,84 @@ class TestGetNote:
         assert len(response.json()) == 15
         assert response.json()[0]["user_name"] == "test_user_2"
 
+    async def test_get_notes_filters_reuse_statement(
+        self,
+        async_client: AsyncClient,
+    ):
+        statements = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters, context.cache_hit))
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get("/notes/?title=test_title_1&page=2")
+            first, first_params, _ = statements[-1]
+            response = await async_client.get("/notes/?title=test_title_2&page=2")
+            second, second_params, cache_hit = statements[-1]
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 200
+        # Значения фильтра и смещение передаются параметрами одного запроса
+        assert first == second
+        assert "test_title" not in second
+        assert "test_title_1" in first_params
+        assert "test_title_2" in second_params
+        assert cache_hit == CacheStats.CACHE_HIT
+
+    async def test_get_notes_with_total(
+        self,
+        async_client: AsyncClient,
+    ):
+        response = await async_client.get(
+            "/notes/?limit=20&with_total=true&exact_total=true"
+        )
+        assert response.status_code == 200
+        first_page = response.json()
+        assert len(first_page["items"]) == 20
+        assert first_page["total"] == 30
+        assert first_page["next"] == response.headers["X-Next-Cursor"]
+        assert "total" not in first_page["items"][0]
+
+        response = await async_client.get(
+            "/notes/?limit=20&page=2&with_total=true&exact_total=true"
+        )
+        second_page = response.json()
+        assert len(second_page["items"]) == 10
+        assert second_page["total"] == 30
+        assert second_page["next"] is None
+
+        response = await async_client.get(
+            f"/notes/?limit=20&cursor={first_page['next']}&with_total=true"
+            "&exact_total=true"
+        )
+        assert response.json()["items"] == second_page["items"]
+        assert response.json()["total"] is None
+
+        response = await async_client.get("/notes/?title=test_title_1&with_total=true")
+        assert response.json()["total"] == 1
+
+    async def test_get_notes_with_estimated_total(
+        self,
+        async_client: AsyncClient,
+    ):
+        async with async_session_maker() as session:
+            await session.execute(text("ANALYZE note"))
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get("/notes/?with_total=true")
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 200
+        assert response.json()["total"] == 30
+        assert any("reltuples" in statement for statement in statements)
+        assert not any("count(*) OVER ()" in statement for statement in statements)
+
     async def test_get_notes_user(
         self,
         async_client: AsyncClient,
@@ -268,6 +480,140 @@ class TestGetNote:
         assert "created_at" in note
         assert "updated_at" in note
 
+    async def test_get_notes_user_cursor_pagination(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+
+        response = await async_client.get("/notes/user/?limit=10", headers=headers)
+        assert response.status_code == 200
+        first_page = response.json()
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = await async_client.get(
+            f"/notes/user/?limit=10&cursor={cursor}", headers=headers
+        )
+        assert response.status_code == 200
+        second_page = response.json()
+        assert len(second_page) == 5
+        ids = [note["id"] for note in first_page + second_page]
+        assert len(set(ids)) == 15
+
+    async def test_get_notes_user_with_total(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+
+        response = await async_client.get(
+            "/notes/user/?limit=10&with_total=true", headers=headers
+        )
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) == 10
+        assert page["total"] == 15
+        assert page["next"] == response.headers["X-Next-Cursor"]
+
+    async def test_get_notes_user_stats(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+
+        async def count_notes() -> tuple[int, int]:
+            async with async_session_maker() as session:
+                query = select(
+                    func.count(),
+                    func.coalesce(func.sum(func.octet_length(Note.content)), 0),
+                ).where(Note.user_id == 1)
+                result = await session.execute(query)
+                return tuple(result.one())
+
+        async def get_stats() -> dict:
+            response = await async_client.get("/notes/user/stats", headers=headers)
+            assert response.status_code == 200
+            return response.json()
+
+        note_count, content_bytes = await count_notes()
+        stats = await get_stats()
+        assert (stats["note_count"], stats["total_content_bytes"]) == (
+            note_count,
+            content_bytes,
+        )
+
+        response = await async_client.post(
+            "/notes/", json={"title": "stats", "content": "я" * 10}, headers=headers
+        )
+        note_id = response.json()["id"]
+        stats = await get_stats()
+        assert stats["note_count"] == note_count + 1
+        assert stats["total_content_bytes"] == content_bytes + 20
+        assert stats["last_updated_at"] == response.json()["updated_at"]
+
+        await async_client.put(
+            f"/notes/{note_id}/", json={"content": "abc"}, headers=headers
+        )
+        response = await async_client.post(
+            "/notes/bulk",
+            json=[{"title": "stats", "content": "abc"} for _ in range(2)],
+            headers=headers,
+        )
+        bulk_ids = [note["id"] for note in response.json()]
+        stats = await get_stats()
+        assert stats["note_count"] == note_count + 3
+        assert stats["total_content_bytes"] == content_bytes + 9
+
+        await async_client.request(
+            "DELETE", "/notes/bulk", json=bulk_ids, headers=headers
+        )
+        await async_client.delete(f"/notes/{note_id}/", headers=headers)
+        stats = await get_stats()
+        assert (stats["note_count"], stats["total_content_bytes"]) == (
+            note_count,
+            content_bytes,
+        )
+        assert (stats["note_count"], stats["total_content_bytes"]) == (
+            await count_notes()
+        )
+
+        response = await async_client.get("/notes/user/stats")
+        assert response.status_code == 401
+
+    async def test_export_notes_user(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+
+        response = await async_client.get("/notes/user/export", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        notes = [json.loads(line) for line in response.text.splitlines()]
+        assert len(notes) == 15
+        assert notes[0]["id"] == 1
+        assert notes[0]["title"] == "test_title_0"
+        assert notes[0]["content"] == "test_content_0"
+        assert "created_at" in notes[0]
+        assert "updated_at" in notes[0]
+
+        response = await async_client.get(
+            "/notes/user/export?format=csv", headers=headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 15
+        assert rows[0]["id"] == "1"
+        assert rows[0]["title"] == "test_title_0"
+
+        response = await async_client.get("/notes/user/export")
+        assert response.status_code == 401
+
     async def test_get_notes_unauthorized_user(
         self,
         async_client: AsyncClient,
@@ -276,6 +622,268 @@ class TestGetNote:
         assert response.status_code == 401
         assert response.json()["detail"] == "Unauthorized"
 
+    async def test_get_notes_rate_limit(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+        monkeypatch,
+    ):
+        limiter = RateLimiter(
+            MemoryRateLimitBackend(),
+            limits={"list": "2/minute", "write": "1/hour"},
+        )
+        monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+        for _ in range(2):
+            response = await async_client.get("/notes/?limit=10")
+            assert response.status_code == 200
+        response = await async_client.get("/notes/?limit=10")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "30"
+
+        # Запросы пользователя ограничиваются отдельно от запросов с IP адреса
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        response = await async_client.get("/notes/user/?limit=10", headers=headers)
+        assert response.status_code == 200
+        response = await async_client.put("/notes/1/", json={}, headers=headers)
+        assert response.status_code == 400
+        response = await async_client.put("/notes/1/", json={}, headers=headers)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3600"
+
+    async def test_get_notes_summary(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        response = await async_client.post(
+            "/notes/",
+            json={"title": "long", "content": "a" * 1000},
+            headers=headers,
+        )
+        note_id = response.json()["id"]
+
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get(
+                "/notes/user/?view=summary", headers=headers
+            )
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 200
+        note = response.json()[0]
+        assert note["id"] == note_id
+        assert "content" not in note
+        assert note["preview"] == "a" * 200
+        assert "left(note.content" in statements[-1]
+        assert "note.title, note.content" not in statements[-1]
+
+        response = await async_client.get("/notes/?view=summary&with_total=true")
+        assert response.status_code == 200
+        note = response.json()["items"][0]
+        assert set(note) == {
+            "id",
+            "title",
+            "preview",
+            "created_at",
+            "updated_at",
+            "user_name",
+        }
+
+        response = await async_client.get("/notes/?view=short")
+        assert response.status_code == 422
+
+        # В кратком представлении нет content, курсор его не содержит
+        await assert_cursor_pages(
+            async_client, "/notes/?view=summary&order_by=content&limit=5"
+        )
+
+        await async_client.delete(f"/notes/{note_id}/", headers=headers)
+
+    async def test_get_notes_compressed(self, async_client: AsyncClient):
+        response = await async_client.get(
+            "/notes/?limit=50", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert len(response.json()) == 30
+
+    async def test_get_note_by_id_not_modified(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        note_id = 7
+        response = await async_client.get(f"/notes/{note_id}/")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+        assert etag.startswith('W/"')
+
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get(
+                f"/notes/{note_id}/", headers={"If-None-Match": etag}
+            )
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        assert not any("note.content" in statement for statement in statements)
+
+        response = await async_client.get(
+            f"/notes/{note_id}/", headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == 304
+
+        response = await async_client.put(
+            f"/notes/{note_id}/",
+            json={"content": "test_content_6_new"},
+            headers={"Authorization": f"Bearer {jwt_token}"},
+        )
+        assert response.status_code == 200
+
+        response = await async_client.get(
+            f"/notes/{note_id}/", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["content"] == "test_content_6_new"
+
+    async def test_get_notes_not_modified(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get("/notes/?limit=5&with_total=true")
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 200
+        # ETag считается по строкам страницы, без запроса по всей выборке
+        assert not any("max(note.updated_at)" in stmt for stmt in statements)
+        assert len([stmt for stmt in statements if "FROM note" in stmt]) == 1
+        etag = response.headers["ETag"]
+
+        statements.clear()
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.get(
+                "/notes/?limit=5&with_total=true", headers={"If-None-Match": etag}
+            )
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 304
+        # Для 304 content не загружается
+        assert not any("note.content" in stmt for stmt in statements)
+
+        # Имя пользователя есть в строках списка, его изменение меняет ETag
+        async with async_session_maker() as session:
+            await session.execute(
+                text("UPDATE \"user\" SET user_name = user_name || '_new'")
+            )
+            await session.commit()
+        try:
+            response = await async_client.get(
+                "/notes/?limit=5&with_total=true", headers={"If-None-Match": etag}
+            )
+            assert response.status_code == 200
+        finally:
+            async with async_session_maker() as session:
+                await session.execute(
+                    text(
+                        'UPDATE "user" SET user_name = '
+                        "left(user_name, length(user_name) - 4)"
+                    )
+                )
+                await session.commit()
+
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        response = await async_client.post(
+            "/notes/", json={"title": "title", "content": "content"}, headers=headers
+        )
+        note_id = response.json()["id"]
+        response = await async_client.get(
+            "/notes/?limit=5&with_total=true", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        await async_client.delete(f"/notes/{note_id}/", headers=headers)
+
+    async def test_get_notes_user_not_modified(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        response = await async_client.get("/notes/user/?limit=5", headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = await async_client.get(
+            "/notes/user/?limit=5", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        # Изменение без изменения счетчиков и времени изменения меняет ETag
+        async with async_session_maker() as session:
+            await session.execute(
+                text(
+                    "UPDATE note SET title = title WHERE id = "
+                    "(SELECT min(id) FROM note WHERE user_id = 1)"
+                )
+            )
+            await session.commit()
+        response = await async_client.get(
+            "/notes/user/?limit=5", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = await async_client.get(
+            "/notes/user/?limit=10", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
+        response = await async_client.get("/notes/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        response = await async_client.post(
+            "/notes/",
+            json={"title": "title", "content": "content"},
+            headers=headers,
+        )
+        note_id = response.json()["id"]
+        response = await async_client.get(
+            "/notes/user/?limit=5", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        await async_client.delete(f"/notes/{note_id}/", headers=headers)
+        response = await async_client.get(
+            "/notes/user/?limit=5", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
 
 class TestUpdateNote:
     async def test_update_note(
@@ -339,6 +947,110 @@ class TestUpdateNote:
         assert note.title == new_date_note_2["title"]
         assert note.content == new_date_note_3["content"]
 
+    async def test_update_note_uses_one_connection(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        connections = []
+        statements = []
+
+        def on_connect(*args):
+            connections.append(args)
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "connect", on_connect)
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            response = await async_client.put(
+                "/notes/3/", json={"title": "test_title_2"}, headers=headers
+            )
+        finally:
+            event.remove(engine_test.sync_engine, "connect", on_connect)
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        assert response.status_code == 200
+        assert len(connections) == 1
+        note_statements = [stmt for stmt in statements if "note" in stmt]
+        assert len(note_statements) == 1
+        assert note_statements[0].startswith("UPDATE note")
+
+    async def test_update_note_invalidates_cache(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        note_id = 5
+        response = await async_client.get(f"/notes/{note_id}/")
+        assert response.json()["content"] == "test_content_4"
+
+        response = await async_client.put(
+            f"/notes/{note_id}/",
+            json={"content": "test_content_4_new"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        response = await async_client.get(f"/notes/{note_id}/")
+        assert response.json()["content"] == "test_content_4_new"
+
+    async def test_update_note_write_behind(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+
+        async def write(owner: tuple[int, bool], updates: dict) -> None:
+            async with async_session_maker() as session:
+                await NotesRepository(session).update_notes_by_owner(
+                    [{"id": note_id, **values} for note_id, values in updates.items()],
+                    *owner,
+                )
+
+        write_queue = WriteBehindQueue(write, delay=60)
+        app.dependency_overrides[get_note_write_queue] = lambda: write_queue
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine_test.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            note_id = 9
+            for note_param in ({"title": "autosave_1"}, {"content": "autosave_2"}):
+                response = await async_client.put(
+                    f"/notes/{note_id}/", json=note_param, headers=headers
+                )
+                assert response.status_code == 200
+            response = await async_client.put(
+                "/notes/2/", json={"title": "autosave"}, headers=headers
+            )
+            assert response.status_code == 403
+            assert note_id in write_queue
+            assert not [stmt for stmt in statements if stmt.startswith("UPDATE")]
+
+            # Чтение заметки записывает отложенные изменения одним запросом
+            response = await async_client.get(f"/notes/{note_id}/")
+            assert response.json()["title"] == "autosave_1"
+            assert response.json()["content"] == "autosave_2"
+            assert len([stmt for stmt in statements if stmt.startswith("UPDATE")]) == 1
+            assert note_id not in write_queue
+
+            # Права проверяются и в запросе записи очереди: изменение чужой
+            # заметки, попавшее в очередь, не записывается
+            await write_queue.put(2, {"title": "autosave"}, scope=(1, False))
+            await write_queue.flush(2)
+            response = await async_client.get("/notes/2/")
+            assert response.json()["title"] != "autosave"
+        finally:
+            event.remove(engine_test.sync_engine, "before_cursor_execute", on_execute)
+            del app.dependency_overrides[get_note_write_queue]
+            await write_queue.close()
+
     async def test_update_note_non_params(
         self,
         async_client: AsyncClient,
@@ -414,3 +1126,154 @@ class TestUpdateNote:
         assert note_new is not None
         assert note_old.title == note_new.title
         assert note_old.content == note_new.content
+
+
+class TestBulkNote:
+    @staticmethod
+    async def insert_notes(notes: list[dict]) -> list[int]:
+        async with async_session_maker() as session:
+            query = Insert(Note).values(notes).returning(Note.id)
+            result = await session.execute(query)
+            await session.commit()
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def delete_notes(notes_id: list[int]) -> None:
+        async with async_session_maker() as session:
+            await session.execute(Delete(Note).where(Note.id.in_(notes_id)))
+            await session.commit()
+
+    async def test_create_notes_bulk(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        data_notes = [
+            {"title": f"bulk_title_{i}", "content": f"bulk_content_{i}"}
+            for i in range(3)
+        ]
+        response = await async_client.post(
+            "/notes/bulk", json=data_notes, headers=headers
+        )
+        assert response.status_code == 201
+        created_notes = response.json()
+        assert [note["title"] for note in created_notes] == [
+            note["title"] for note in data_notes
+        ]
+
+        notes_id = [note["id"] for note in created_notes]
+        async with async_session_maker() as session:
+            query: Select = Select(Note).where(Note.id.in_(notes_id))
+            result = await session.execute(query)
+            notes_db = result.scalars().all()
+        assert len(notes_db) == 3
+        assert all(note.user_id == 1 for note in notes_db)
+
+        await self.delete_notes(notes_id)
+
+    async def test_create_notes_bulk_not_valid(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        response = await async_client.post("/notes/bulk", json=[], headers=headers)
+        assert response.status_code == 422
+
+        response = await async_client.post(
+            "/notes/bulk", json=[{"title": "title", "content": "content"}]
+        )
+        assert response.status_code == 401
+
+    async def test_update_notes_bulk(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        note_1, note_2, note_other = await self.insert_notes(
+            [
+                {"title": "bulk_title_1", "content": "bulk_content_1", "user_id": 1},
+                {"title": "bulk_title_2", "content": "bulk_content_2", "user_id": 1},
+                {"title": "bulk_title_3", "content": "bulk_content_3", "user_id": 2},
+            ]
+        )
+        data_notes = [
+            {"id": note_1, "title": "bulk_title_1_new"},
+            {"id": note_2, "content": "bulk_content_2_new"},
+            {"id": note_other, "title": "bulk_title_3_new"},
+            {"id": 100000, "title": "bulk_title_new"},
+            {"id": note_1, "title": "bulk_title_1_duplicate"},
+            {"id": note_2},
+        ]
+        response = await async_client.patch(
+            "/notes/bulk", json=data_notes, headers=headers
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert [result["id"] for result in results] == [
+            note["id"] for note in data_notes
+        ]
+        assert [result["status_code"] for result in results] == [
+            200,
+            200,
+            403,
+            404,
+            400,
+            400,
+        ]
+
+        async with async_session_maker() as session:
+            query: Select = Select(Note).where(
+                Note.id.in_([note_1, note_2, note_other])
+            )
+            result = await session.execute(query)
+            notes_db = {note.id: note for note in result.scalars().all()}
+        assert notes_db[note_1].title == "bulk_title_1_new"
+        assert notes_db[note_1].content == "bulk_content_1"
+        assert notes_db[note_1].created_at != notes_db[note_1].updated_at
+        assert notes_db[note_2].title == "bulk_title_2"
+        assert notes_db[note_2].content == "bulk_content_2_new"
+        assert notes_db[note_other].title == "bulk_title_3"
+
+        await self.delete_notes([note_1, note_2, note_other])
+
+    async def test_delete_notes_bulk(
+        self,
+        async_client: AsyncClient,
+        jwt_token: str,
+    ):
+        headers = {"Authorization": f"Bearer {jwt_token}"}
+        note_1, note_2, note_other = await self.insert_notes(
+            [
+                {"title": "bulk_title_1", "content": "bulk_content_1", "user_id": 1},
+                {"title": "bulk_title_2", "content": "bulk_content_2", "user_id": 1},
+                {"title": "bulk_title_3", "content": "bulk_content_3", "user_id": 2},
+            ]
+        )
+        response = await async_client.request(
+            "DELETE",
+            "/notes/bulk",
+            json=[note_1, note_2, note_other, 100000, note_1, note_other],
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert [result["status_code"] for result in response.json()] == [
+            200,
+            200,
+            403,
+            404,
+            400,
+            400,
+        ]
+        assert response.json()[4]["id"] == note_1
+
+        async with async_session_maker() as session:
+            query: Select = Select(Note.id).where(
+                Note.id.in_([note_1, note_2, note_other])
+            )
+            result = await session.execute(query)
+        assert result.scalars().all() == [note_other]
+
+        await self.delete_notes([note_other])